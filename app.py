@@ -1,36 +1,71 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 from datetime import date
-import os
-from pathlib import Path
-import tempfile
+import functools
+import hashlib
+import re
 import zipfile
 import io
-from fee_extractor import FeeDefaulterExtractor
-from initial_fee_defaulters import InitialFeeDefaulterExtractor
+from concurrent.futures import ThreadPoolExecutor
+from fee_extractor import FeeDefaulterExtractor, CSV_READ_OPTIONS, present_columns
+from initial_fee_defaulters import InitialFeeDefaulterExtractor, PAYMENT_COLUMNS
 
+# Report ZIPs for uploads below this size are stored uncompressed; larger ones use fast deflate
+ZIP_STORED_MAX_BYTES = 10 * 1024 * 1024
+ZIP_DEFLATE_LEVEL = 1
+
+SCHOOLS = ['Excel Global School', 'Excel Central School']
+
+# Indian digit grouping: comma before the last 3 digits, then every 2 digits
+INDIAN_GROUPING_PATTERN = re.compile(r'(\d)(?=(\d\d)*\d{3}$)')
+
+# Chart settings shared by every figure, built once at import instead of on each rerun
+GRADE_ORDER = ['Pre-KG', 'LKG', 'UKG'] + [f'Grade {str(i).zfill(2)}' for i in range(1, 13)]
+GRADE_RANK = {grade: i for i, grade in enumerate(GRADE_ORDER)}
+PIE_COLORS = ['#ff6b6b', '#51cf66']
+CHART_LAYOUT = dict(height=400)
+
+@functools.lru_cache(maxsize=4096)
 def format_indian_currency(amount):
     """Format number in Indian currency style (lakhs and crores)"""
     amount = int(amount)
-    
-    if amount < 0:
-        return f"-₹{format_indian_currency(-amount)[1:]}"
-    
-    # Convert to string and reverse for easier processing
-    s = str(amount)[::-1]
-    
-    # Add commas - first after 3 digits, then every 2 digits
-    result = []
-    for i, digit in enumerate(s):
-        if i == 3:
-            result.append(',')
-        elif i > 3 and (i - 3) % 2 == 0:
-            result.append(',')
-        result.append(digit)
-    
-    return f"₹{(''.join(result))[::-1]}"
+    grouped = INDIAN_GROUPING_PATTERN.sub(r'\1,', str(abs(amount)))
+    return f"-₹{grouped}" if amount < 0 else f"₹{grouped}"
+
+def format_indian_series(values):
+    """Format a numeric Series in Indian currency style in a single vectorized pass"""
+    amounts = values.astype('int64')
+    grouped = amounts.abs().astype(str).str.replace(INDIAN_GROUPING_PATTERN, r'\1,', regex=True)
+    return ('₹' + grouped).mask(amounts < 0, '-₹' + grouped)
+
+@functools.lru_cache(maxsize=32)
+def currency_ticks(y_max):
+    """Six evenly spaced y-axis ticks from 0 to 110% of y_max with Indian currency labels"""
+    tick_vals = np.linspace(0, y_max * 1.1, 6)
+    return tuple(tick_vals.tolist()), tuple(format_indian_series(pd.Series(tick_vals)))
+
+def format_rupee_series(values):
+    """Format positive amounts as ₹1,234.56 and everything else as '-' for a whole Series at once"""
+    formatted = '₹' + values.map('{:,.2f}'.format)
+    return formatted.where(values > 0, '-')
+
+def grade_sort_key(grade):
+    """Sort key placing Pre-KG, LKG, UKG first, then Grade 1-12 numerically, then anything else"""
+    if grade == 'Pre-KG':
+        return (0, 0)
+    elif grade == 'LKG':
+        return (1, 0)
+    elif grade == 'UKG':
+        return (2, 0)
+    elif grade.startswith('Grade '):
+        try:
+            grade_num = int(grade.replace('Grade ', ''))
+            return (3, grade_num)
+        except ValueError:
+            return (4, grade)
+    else:
+        return (4, grade)
 
 # Page configuration
 st.set_page_config(
@@ -69,8 +104,9 @@ def create_visualizations(summary_data, school_name, total_students=None):
     if summary_data.empty and not total_students:
         return None, None, None
     
-    # Define proper grade order
-    grade_order = ['Pre-KG', 'LKG', 'UKG'] + [f'Grade {str(i).zfill(2)}' for i in range(1, 13)]
+    # Plotly is imported on first use so app start-up doesn't pay for it
+    import plotly.express as px
+    import plotly.graph_objects as go
     
     # Payment status distribution
     # If total_students is provided, use it; otherwise use summary data length
@@ -87,17 +123,14 @@ def create_visualizations(summary_data, school_name, total_students=None):
         labels=['Defaulters', 'Paid'],
         values=[defaulters, paid_students],
         hole=.3,
-        marker_colors=['#ff6b6b', '#51cf66']
+        marker_colors=PIE_COLORS
     )])
-    fig_pie.update_layout(
-        title=f"Payment Status Distribution - {school_name}",
-        height=400
-    )
+    fig_pie.update_layout(CHART_LAYOUT, title=f"Payment Status Distribution - {school_name}")
     
     # Defaulters by grade
-    grade_counts = summary_data[summary_data['Total Outstanding'] > 0].groupby('Grade').size().reset_index(name='Count')
-    # Sort by grade order
-    grade_counts['Grade_Order'] = grade_counts['Grade'].map({grade: i for i, grade in enumerate(grade_order)})
+    grade_counts = summary_data[summary_data['Total Outstanding'] > 0].groupby('Grade', observed=True).size().reset_index(name='Count')
+    # Sort by grade order (map plain values so the rank stays numeric for categorical grades)
+    grade_counts['Grade_Order'] = grade_counts['Grade'].astype(object).map(GRADE_RANK)
     grade_counts = grade_counts.sort_values('Grade_Order')
     
     fig_bar = px.bar(
@@ -108,13 +141,14 @@ def create_visualizations(summary_data, school_name, total_students=None):
         color='Count',
         color_continuous_scale='RdYlGn_r'
     )
-    fig_bar.update_layout(height=400)
-    fig_bar.update_xaxes(categoryorder='array', categoryarray=[g for g in grade_order if g in grade_counts['Grade'].values])
+    fig_bar.update_layout(CHART_LAYOUT)
+    present_grades = set(grade_counts['Grade'])
+    fig_bar.update_xaxes(categoryorder='array', categoryarray=[g for g in GRADE_ORDER if g in present_grades])
     
     # Outstanding amount by grade
-    grade_amounts = summary_data.groupby('Grade')['Total Outstanding'].sum().reset_index()
+    grade_amounts = summary_data.groupby('Grade', observed=True)['Total Outstanding'].sum().reset_index()
     # Sort by grade order
-    grade_amounts['Grade_Order'] = grade_amounts['Grade'].map({grade: i for i, grade in enumerate(grade_order)})
+    grade_amounts['Grade_Order'] = grade_amounts['Grade'].astype(object).map(GRADE_RANK)
     grade_amounts = grade_amounts.sort_values('Grade_Order')
     
     fig_amount = px.bar(
@@ -126,166 +160,282 @@ def create_visualizations(summary_data, school_name, total_students=None):
         color_continuous_scale='Blues',
         text='Total Outstanding'
     )
-    # Format text for Indian currency in the chart
-    grade_amounts['Total Outstanding Text'] = grade_amounts['Total Outstanding'].apply(format_indian_currency)
+    # Format text for Indian currency in the chart (passed straight through, not stored on the frame)
     fig_amount.update_traces(
-        text=grade_amounts['Total Outstanding Text'],
+        text=format_indian_series(grade_amounts['Total Outstanding']).to_numpy(),
         texttemplate='%{text}',
         textposition='outside'
     )
     fig_amount.update_layout(height=600)
-    fig_amount.update_xaxes(categoryorder='array', categoryarray=[g for g in grade_order if g in grade_amounts['Grade'].values])
+    present_grades = set(grade_amounts['Grade'])
+    fig_amount.update_xaxes(categoryorder='array', categoryarray=[g for g in GRADE_ORDER if g in present_grades])
     
     return fig_pie, fig_bar, fig_amount
 
+def compact_summary(summary_df):
+    """Shrink a school summary for session state: smallest integer dtypes and categorical Grade/Section"""
+    summary_df = summary_df.reset_index(drop=True)
+    # Only whole-number columns are downcast, so amounts never lose precision
+    for col in summary_df.select_dtypes('number').columns:
+        summary_df[col] = pd.to_numeric(summary_df[col], downcast='integer')
+    # Categorical Grade/Section let the filter widgets read their options without a row scan
+    return summary_df.astype({'Grade': 'category', 'Section': 'category'})
+
+def build_teachers_view(summary_df):
+    """Create the Teachers View table with Paid/Unpaid status per fee column"""
+    # Get fee columns from the actual data
+    fee_columns = [col for col in summary_df.columns 
+                 if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
+                               'Grade', 'Section', 'Total Outstanding']]
+    # One comparison over all fee columns, attached in a single assign (no copy + per-column writes)
+    status = np.where(summary_df[fee_columns].to_numpy() > 0, 'Unpaid', 'Paid')
+    return summary_df[['Student Name', 'Enrollment No', 'Grade', 'Section']].assign(
+        **{col: status[:, i] for i, col in enumerate(fee_columns)}
+    )
+
+def currency_columns(df):
+    """Numeric amount columns of a school summary (everything except the student details)"""
+    return [col for col in df.columns 
+            if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
+                           'Grade', 'Section']
+            and pd.api.types.is_numeric_dtype(df[col])]
+
+def build_accounts_view(summary_df):
+    """Create the Accounts View table with numeric outstanding amounts"""
+    accounts_df = summary_df.copy()
+    currency_cols = currency_columns(accounts_df)
+    # Negative values (-1 = paid marker) become empty cells; amounts stay numeric and sortable
+    accounts_df[currency_cols] = accounts_df[currency_cols].where(accounts_df[currency_cols] >= 0)
+    return accounts_df
+
+def view_to_parquet(df):
+    """Serialize a table view to Parquet bytes for compact storage in session state"""
+    # Object columns can mix types (e.g. numeric enrollment codes with '' for students without one),
+    # which Arrow can't store, so they are written as text with '' for missing values
+    object_cols = df.select_dtypes('object').columns
+    if len(object_cols):
+        df = df.assign(**{col: df[col].where(df[col].notna(), '').astype(str) for col in object_cols})
+    return df.to_parquet(index=False, compression='zstd', compression_level=1)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_view(data):
+    """Deserialize a Parquet table view once per contents (shared, treated as read-only)"""
+    return pd.read_parquet(io.BytesIO(data))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_figures(school_name, summary_key, total_students, _summary):
+    """Build the school dashboard figures once per summary contents (each caller gets its own copy)"""
+    return create_visualizations(_summary, school_name, total_students)
+
+def zip_options_for(upload_size):
+    """ZipFile compression settings for reports generated from an upload of the given size"""
+    if upload_size < ZIP_STORED_MAX_BYTES:
+        return {'compression': zipfile.ZIP_STORED}
+    return {'compression': zipfile.ZIP_DEFLATED, 'compresslevel': ZIP_DEFLATE_LEVEL}
+
+@st.cache_data(max_entries=8, ttl=3600, show_spinner=False)
+def _load_csvs(contacts_bytes, invoices_bytes):
+    """Parse the uploaded Contacts/Invoice CSVs once per file contents"""
+    extractor = FeeDefaulterExtractor(
+        contacts_path=io.BytesIO(contacts_bytes),
+        invoices_path=io.BytesIO(invoices_bytes),
+        output_base_path=None
+    )
+    extractor.load_data()
+    return extractor.contacts_df, extractor.invoices_df
+
+@st.cache_data(max_entries=8, ttl=3600, show_spinner=False)
+def _load_payments_csv(payments_bytes):
+    """Parse the uploaded Customer_Payment CSV once per file contents"""
+    payments_file = io.BytesIO(payments_bytes)
+    return pd.read_csv(payments_file, usecols=present_columns(payments_file, PAYMENT_COLUMNS), **CSV_READ_OPTIONS)
+
 def process_uploaded_files(contacts_file, invoices_file):
     """Process uploaded files and generate reports"""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Save uploaded files
-        contacts_path = os.path.join(temp_dir, "Contacts.csv")
-        invoices_path = os.path.join(temp_dir, "Invoice.csv")
-        output_path = os.path.join(temp_dir, "output")
-        
-        with open(contacts_path, "wb") as f:
-            f.write(contacts_file.getbuffer())
-        with open(invoices_path, "wb") as f:
-            f.write(invoices_file.getbuffer())
-        
-        # Run extraction with fixed logic
-        extractor = FeeDefaulterExtractor(
-            contacts_path=contacts_path,
-            invoices_path=invoices_path,
-            output_base_path=output_path
-        )
-        
-        # Load and process data
-        extractor.load_data()
-        # Process invoices with proportional balance allocation
-        defaulter_invoices = extractor.process_invoices()
-        
-        # Note: Stats will be shown in the console/logs, not in the UI during processing
-        
-        # Process each school
-        results = {}
-        school_stats = {}
-        for school in ['Excel Global School', 'Excel Central School']:
-            summary_df = extractor.create_student_summary(defaulter_invoices, school)
-            
-            # Get total students in school from contacts
-            school_total = len(extractor.contacts_df[
-                extractor.contacts_df['School'] == school
-            ]['Contact ID'].unique())
-            
+    # Key the cached pipeline on the processing date and the raw file contents, so re-processing the
+    # same uploads is instant but due months and overdue checks are redone once the date changes
+    return _process_uploaded_files_cached(
+        date.today().isoformat(), contacts_file.getvalue(), invoices_file.getvalue()
+    )
+
+def _process_school(extractor, defaulter_invoices, school, school_total):
+    """Build one school's summary, table views and dashboard stats"""
+    summary_df = extractor.create_student_summary(defaulter_invoices, school)
+    
+    if summary_df.empty:
+        views = {name: view_to_parquet(pd.DataFrame()) for name in ['raw', 'teachers', 'accounts']}
+        stats = {
+            'total_students': school_total,
+            'defaulters': 0,
+            'total_outstanding': 0,
+            'grades_affected': 0
+        }
+        return summary_df, views, stats
+    
+    compact_df = compact_summary(summary_df)
+    # Build both table views once so widget reruns only filter and display;
+    # they are kept as Parquet bytes and decoded per tab when shown
+    views = {
+        'raw': view_to_parquet(compact_df),
+        'teachers': view_to_parquet(build_teachers_view(compact_df)),
+        'accounts': view_to_parquet(build_accounts_view(compact_df))
+    }
+    # Dashboard metrics are computed once here rather than on every rerun
+    stats = {
+        'total_students': school_total,
+        'defaulters': int((compact_df['Total Outstanding'] > 0).sum()),
+        'total_outstanding': int(compact_df['Total Outstanding'].sum()),
+        'grades_affected': int(compact_df['Grade'].nunique())
+    }
+    return summary_df, views, stats
+
+# Persisted to disk so re-uploading the same files after a restart skips the pipeline
+# (Streamlit ignores TTL for persisted caches; max_entries bounds it instead). The pickled
+# results hold student names, fees and contact details and live in Streamlit's cache folder
+# (~/.streamlit/cache) until evicted or cleared with `streamlit cache clear`
+@st.cache_data(max_entries=8, persist="disk", show_spinner=False)
+def _process_uploaded_files_cached(today, contacts_bytes, invoices_bytes):
+    """Run the extraction pipeline as of today (ISO date) on raw CSV bytes (memoized on both)"""
+    # Run extraction with fixed logic on the cached parsed uploads
+    # (reports go into the ZIP, so no temp files or output folder are needed)
+    contacts_df, invoices_df = _load_csvs(contacts_bytes, invoices_bytes)
+    extractor = FeeDefaulterExtractor.from_dataframes(contacts_df, invoices_df)
+    # Process as of the keyed date, so a run straddling midnight can't cache another day's results
+    extractor.today = date.fromisoformat(today)
+    
+    # Process invoices with proportional balance allocation
+    defaulter_invoices = extractor.process_invoices()
+    
+    # Note: Stats will be shown in the console/logs, not in the UI during processing
+    
+    # Total students per school from contacts, in one pass over the table
+    school_totals = extractor.contacts_df.groupby('School')['Contact ID'].nunique(dropna=False).to_dict()
+    
+    # Summaries for both schools are independent, so build them side by side
+    with ThreadPoolExecutor(max_workers=len(SCHOOLS)) as executor:
+        futures = {
+            school: executor.submit(
+                _process_school, extractor, defaulter_invoices, school, school_totals.get(school, 0)
+            )
+            for school in SCHOOLS
+        }
+        processed = {school: future.result() for school, future in futures.items()}
+    
+    # Stream each school's reports into an in-memory ZIP (ZipFile writes are not thread-safe)
+    results = {}
+    school_stats = {}
+    zip_buffer = io.BytesIO()
+    # Report volume scales with the invoice upload, so its size picks the compression
+    with zipfile.ZipFile(zip_buffer, 'w', **zip_options_for(len(invoices_bytes))) as zip_file:
+        for school in SCHOOLS:
+            summary_df, results[school], school_stats[school] = processed[school]
             if not summary_df.empty:
-                extractor.save_reports(summary_df, school)
-                results[school] = summary_df
-            else:
-                results[school] = pd.DataFrame()
-            
-            school_stats[school] = {
-                'total_students': school_total,
-                'defaulters': len(summary_df) if not summary_df.empty else 0
-            }
-        
-        # Process payment analytics data - pass the contacts data for accurate counts
-        # Note: create_payment_analytics method doesn't exist in FeeDefaulterExtractor
-        payment_analytics = None
+                extractor.save_reports(summary_df, school, zip_file=zip_file)
+    
+    # Process payment analytics data - pass the contacts data for accurate counts
+    # Note: create_payment_analytics method doesn't exist in FeeDefaulterExtractor
+    payment_analytics = None
+
+    zip_data = zip_buffer.getvalue()
 
-        # Create ZIP file for downloads
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Add all generated reports to the ZIP
-            for root, dirs, files in os.walk(output_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, output_path)
-                    zip_file.write(file_path, arcname)
+    return results, zip_data, school_stats, payment_analytics
 
-        zip_buffer.seek(0)
-        zip_data = zip_buffer.getvalue()
+@st.cache_data(show_spinner=False, max_entries=16)
+def _grade_section_options(school, summary_key, _summary):
+    """Sorted Grade/Section filter options for a school summary, cached on its contents"""
+    return (
+        sorted(_summary['Grade'].cat.categories),
+        sorted(_summary['Section'].cat.categories)
+    )
 
-        return results, zip_data, school_stats, payment_analytics
+@st.cache_data(show_spinner=False, max_entries=16)
+def _student_names_lower(summary_key, _summary):
+    """Case-folded student names as a NumPy string array, cached per summary contents"""
+    return _summary['Student Name'].fillna('').str.casefold().to_numpy(dtype=str)
 
 def process_initial_fee_defaulters(contacts_file, invoices_file, payments_file):
     """Process files for initial fee and opening balance defaulters"""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Save uploaded files
-        contacts_path = os.path.join(temp_dir, "Contacts.csv")
-        invoices_path = os.path.join(temp_dir, "Invoice.csv")
-        payments_path = os.path.join(temp_dir, "Customer_Payment.csv")
-        output_path = os.path.join(temp_dir, "output")
-
-        with open(contacts_path, "wb") as f:
-            f.write(contacts_file.getbuffer())
-        with open(invoices_path, "wb") as f:
-            f.write(invoices_file.getbuffer())
-        with open(payments_path, "wb") as f:
-            f.write(payments_file.getbuffer())
-
-        # Run initial fee defaulter extraction
-        extractor = InitialFeeDefaulterExtractor(
-            contacts_path=contacts_path,
-            invoices_path=invoices_path,
-            payments_path=payments_path,
-            output_base_path=output_path
-        )
+    # Key the cached pipeline on the processing date and the raw file contents, like process_uploaded_files
+    return _process_initial_fee_defaulters_cached(
+        date.today().isoformat(), contacts_file.getvalue(), invoices_file.getvalue(), payments_file.getvalue()
+    )
 
-        # Process data and get results
-        defaulters_df = extractor.extract_initial_fee_defaulters()
+# Persisted to disk so re-uploading the same files after a restart skips the pipeline
+# (Streamlit ignores TTL for persisted caches; max_entries bounds it instead)
+@st.cache_data(max_entries=8, persist="disk", show_spinner=False)
+def _process_initial_fee_defaulters_cached(today, contacts_bytes, invoices_bytes, payments_bytes):
+    """Run the initial fee pipeline as of today (ISO date) on raw CSV bytes (memoized on both)"""
+    # Reuse the parsed uploads (shared with the main pipeline) instead of re-reading them from disk
+    contacts_df, invoices_df = _load_csvs(contacts_bytes, invoices_bytes)
+    payments_df = _load_payments_csv(payments_bytes)
 
-        # Create ZIP file for downloads
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            if not defaulters_df.empty:
-                # Save the main report
-                main_report_path = os.path.join(output_path, 'fee_and_opening_balance_defaulters.csv')
-                extractor.save_defaulters_report(defaulters_df)
+    # Run initial fee defaulter extraction as of the keyed date
+    extractor = InitialFeeDefaulterExtractor.from_dataframes(contacts_df, invoices_df, payments_df)
+    extractor.today = date.fromisoformat(today)
 
-                if os.path.exists(main_report_path):
-                    zip_file.write(main_report_path, 'fee_and_opening_balance_defaulters.csv')
+    # Process data and get results
+    defaulters_df = extractor.extract_initial_fee_defaulters()
 
-        zip_buffer.seek(0)
-        zip_data = zip_buffer.getvalue()
+    # Create ZIP file for downloads
+    zip_buffer = io.BytesIO()
+    # One row per defaulting student, so the contacts upload bounds the report size
+    with zipfile.ZipFile(zip_buffer, 'w', **zip_options_for(len(contacts_bytes))) as zip_file:
+        if not defaulters_df.empty:
+            # Save the main report directly into the ZIP
+            extractor.save_defaulters_report(defaulters_df, zip_file=zip_file)
 
-        return defaulters_df, zip_data
+    zip_buffer.seek(0)
+    zip_data = zip_buffer.getvalue()
+
+    # Dashboard metrics are computed once here rather than on every rerun
+    initial_fee_stats = {'total_defaulters': 0, 'fee_defaulters': 0, 'opening_balance_defaulters': 0, 'total_outstanding': 0}
+    if not defaulters_df.empty:
+        opening_balance_rows = defaulters_df['Status'] == 'Opening Balance Not Fully Paid'
+        initial_fee_stats = {
+            'total_defaulters': len(defaulters_df),
+            'fee_defaulters': int((defaulters_df['Status'] == 'Initial Fee Not Paid').sum()),
+            'opening_balance_defaulters': int(opening_balance_rows.sum()),
+            'total_outstanding': defaulters_df.loc[opening_balance_rows, 'Remaining Opening Balance'].sum()
+        }
+
+    if not defaulters_df.empty:
+        # Few distinct values per column, so the filters compare integer codes and read options from categories
+        # (astype sorts categories alphabetically; Grade categories are put in school order once here)
+        grades = sorted(defaulters_df['Grade'].dropna().unique(), key=grade_sort_key)
+        defaulters_df = defaulters_df.astype({
+            'School': 'category',
+            'Grade': pd.CategoricalDtype(grades),
+            'Section': 'category',
+            'Status': 'category'
+        })
+
+    return defaulters_df, zip_data, initial_fee_stats
 
 def process_payment_analytics(invoices_path, contacts_path):
     """Process payment analytics from invoice data"""
     import pandas as pd
-    df = pd.read_csv(invoices_path)
+    # Parse invoice dates once here; sorting and month bucketing below reuse them
+    df = pd.read_csv(invoices_path, parse_dates=['Invoice Date'], cache_dates=True)
     contacts_df = pd.read_csv(contacts_path)
     
-    # Get ALL invoices grouped by invoice number to avoid duplicates
-    all_invoices = df.groupby('Invoice Number').agg({
-        'Total': 'first',
-        'Balance': 'first',
-        'School': 'first',
-        'Grade': 'first',
-        'Section': 'first',
-        'Customer Name': 'first',
-        'Customer ID': 'first',
-        'Invoice Date': 'first',
-        'Invoice Status': 'first'
-    }).reset_index()
+    # Get ALL invoices, one row per invoice number to avoid duplicates
+    # (invoice-level fields repeat on every line item, so the first row carries them all)
+    all_invoices = df.dropna(subset=['Invoice Number']).drop_duplicates(subset='Invoice Number')[[
+        'Invoice Number', 'Total', 'Balance', 'School', 'Grade', 'Section',
+        'Customer Name', 'Customer ID', 'Invoice Date', 'Invoice Status'
+    ]].reset_index(drop=True)
     
-    # Calculate total outstanding balance per student across ALL their invoices
-    # First get the latest grade/section for each student (in case they changed grades)
-    student_latest = all_invoices.sort_values('Invoice Date').groupby('Customer ID').agg({
+    # Calculate total outstanding balance per student across ALL their invoices,
+    # taking the latest grade/section (in case they changed grades) in the same pass
+    student_balances = all_invoices.sort_values('Invoice Date').groupby('Customer ID').agg({
         'School': 'last',
         'Grade': 'last', 
         'Section': 'last',
-        'Customer Name': 'last'
-    }).reset_index()
-    
-    # Calculate total balances per student
-    student_totals = all_invoices.groupby('Customer ID').agg({
+        'Customer Name': 'last',
         'Balance': 'sum',
         'Total': 'sum'
     }).reset_index()
     
-    # Merge to get complete student data
-    student_balances = pd.merge(student_latest, student_totals, on='Customer ID')
-    
     # Students who have FULLY paid (zero total outstanding balance)
     fully_paid_students = student_balances[student_balances['Balance'] == 0].copy()
     
@@ -300,26 +450,43 @@ def process_payment_analytics(invoices_path, contacts_path):
     
     # Calculate payments by grade for each school (from paid invoices)
     grade_payments = paid_invoices.groupby(['School', 'Grade'])['Total'].sum().reset_index()
+    # Ordered categorical Grade (unknown grades after the known ones) so charts sort on codes
+    grade_categories = GRADE_ORDER + sorted(set(grade_payments['Grade']).difference(GRADE_ORDER))
+    grade_payments['Grade'] = pd.Categorical(grade_payments['Grade'], categories=grade_categories, ordered=True)
+    grade_payments = grade_payments.sort_values(['School', 'Grade'], ignore_index=True)
     
     # Calculate monthly collections
-    paid_invoices['Invoice Date'] = pd.to_datetime(paid_invoices['Invoice Date'])
-    paid_invoices['Month'] = paid_invoices['Invoice Date'].dt.strftime('%B %Y')
+    paid_invoices['Month'] = paid_invoices['Invoice Date'].dt.to_period('M').dt.strftime('%B %Y')
     monthly_payments = paid_invoices.groupby(['School', 'Month'])['Total'].sum().reset_index()
+    # Order months chronologically once here rather than re-parsing them on every render
+    monthly_payments = monthly_payments.sort_values(
+        'Month', key=lambda months: pd.to_datetime(months, format='%B %Y'), kind='stable', ignore_index=True
+    )
     
     # Count FULLY PAID students by section (zero outstanding balance)
-    students_paid_by_section = fully_paid_students.groupby(['School', 'Grade', 'Section']).size().reset_index(name='Students_Paid')
+    paid_counts = fully_paid_students.value_counts(['School', 'Grade', 'Section'])
     
     # Add students without invoices to the paid count
     # Get students from contacts who don't have any invoices
-    all_student_ids_with_invoices = set(all_invoices['Customer ID'].unique())
-    contacts_without_invoices = contacts_df[~contacts_df['Contact ID'].isin(all_student_ids_with_invoices)].copy()
+    # isin hashes the unique ID array in C; only read below (rename makes its own frame), so no copy
+    all_student_ids_with_invoices = all_invoices['Customer ID'].unique()
+    contacts_without_invoices = contacts_df.loc[~contacts_df['Contact ID'].isin(all_student_ids_with_invoices)]
     
     if not contacts_without_invoices.empty:
-        # Count students without invoices by section
-        no_invoice_by_section = contacts_without_invoices.groupby(['School', 'Grade', 'Section']).size().reset_index(name='Students_Paid')
-        
-        # Combine with fully paid students
-        students_paid_by_section = pd.concat([students_paid_by_section, no_invoice_by_section]).groupby(['School', 'Grade', 'Section'])['Students_Paid'].sum().reset_index()
+        # Count students without invoices by section and add them to the fully paid counts
+        no_invoice_counts = contacts_without_invoices.value_counts(['School', 'Grade', 'Section'])
+        paid_counts = paid_counts.add(no_invoice_counts, fill_value=0).astype(int)
+    
+    students_paid_by_section = paid_counts.sort_index().reset_index(name='Students_Paid')
+    
+    # Per-school grade/section totals joined with paid counts, built once for the summary tables
+    total_by_section = contacts_df.groupby(['School', 'Grade', 'Section'])['Contact ID'].nunique().reset_index(name='Total_Students')
+    section_summary = total_by_section.merge(students_paid_by_section, on=['School', 'Grade', 'Section'], how='left')
+    section_summary['Students_Paid'] = section_summary['Students_Paid'].fillna(0).astype(int)
+    section_summary_by_school = {
+        school: school_sections.drop(columns='School').reset_index(drop=True)
+        for school, school_sections in section_summary.groupby('School')
+    }
     
     # Get actual total students from contacts
     total_students_by_school = contacts_df.groupby('School')['Contact ID'].nunique().to_dict()
@@ -374,17 +541,122 @@ def process_payment_analytics(invoices_path, contacts_path):
     
     return {
         'paid_invoices': paid_invoices,
+        # Largest/smallest single payment, reduced once here for the summary widgets
+        'paid_stats': {'max': paid_invoices['Total'].max(), 'min': paid_invoices['Total'].min()},
         'school_totals': school_totals,
         'grade_payments': grade_payments,
         'monthly_payments': monthly_payments,
         'total_collected': total_collected,
         'students_paid_by_section': students_paid_by_section,
+        'section_summary': section_summary_by_school,
         'total_students_by_school': total_students_by_school,
         'students_paid_by_school': students_paid_by_school,
         'fully_paid_students': fully_paid_all,
         'students_without_invoices_by_school': students_without_invoices_by_school
     }
 
+def render_school_tab(school_name, views, stats):
+    """Render metrics, charts and the filterable defaulter table for a school"""
+    summary = load_view(views['raw'])
+    if summary.empty:
+        st.info(f"No defaulters found for {school_name}")
+        return
+    
+    # Content hash of the summary, used to key the cached figures and filter options;
+    # digesting the stored Parquet bytes avoids rehashing every row on each rerun
+    summary_key = hashlib.md5(views['raw']).hexdigest()
+    
+    # Metrics
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Students", stats['total_students'])
+    with col2:
+        st.metric("Defaulters", stats['defaulters'])
+    with col3:
+        st.metric("Total Outstanding", format_indian_currency(stats['total_outstanding']))
+    with col4:
+        st.metric("Grades Affected", stats['grades_affected'])
+            
+    # Visualizations
+    st.divider()
+    fig_pie, fig_bar, fig_amount = _cached_figures(school_name, summary_key, stats['total_students'], summary)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(fig_pie, use_container_width=True)
+    with col2:
+        st.plotly_chart(fig_bar, use_container_width=True)
+    
+    st.plotly_chart(fig_amount, use_container_width=True)
+            
+    # Data table with filters
+    st.divider()
+    st.subheader("📋 Defaulter Details")
+    render_defaulter_table(school_name, views, summary, summary_key)
+
+# Fragment: search/filter widgets rerun only the table, so the charts above are not re-sent
+@st.fragment
+def render_defaulter_table(school_name, views, summary, summary_key):
+    """Render the search/filter widgets and the filtered defaulter table for a school"""
+    key_prefix = 'egs' if school_name == 'Excel Global School' else 'ecs'
+    
+    # Search bar
+    search_query = st.text_input(
+        "🔍 Search by Student Name",
+        placeholder="Type student name to search...",
+        key=f"{key_prefix}_search"
+    )
+    
+    grade_options, section_options = _grade_section_options(school_name, summary_key, summary)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        selected_grade = st.selectbox(
+            "Filter by Grade",
+            ["All"] + grade_options,
+            key=f"{key_prefix}_grade"
+        )
+    with col2:
+        selected_section = st.selectbox(
+            "Filter by Section",
+            ["All"] + section_options,
+            key=f"{key_prefix}_section"
+        )
+    with col3:
+        view_type = st.selectbox(
+            "View Type",
+            ["Teachers View", "Accounts View"],
+            key=f"{key_prefix}_view"
+        )
+    
+    # Filter data: compose one boolean mask and index the summary once
+    mask = np.ones(len(summary), dtype=bool)
+    
+    # Cheap categorical equality filters first, so the name search only scans what they keep
+    if selected_grade != "All":
+        mask &= summary['Grade'].values == selected_grade
+    if selected_section != "All":
+        mask &= summary['Section'].values == selected_section
+    
+    # Apply search filter (plain case-insensitive substring match on pre-case-folded names)
+    if search_query:
+        names_lower = _student_names_lower(summary_key, summary)
+        candidates = np.flatnonzero(mask)
+        mask[candidates] = np.char.find(names_lower[candidates], search_query.casefold()) >= 0
+    
+    # Display the precomputed view for the selected rows
+    if view_type == "Teachers View":
+        st.dataframe(load_view(views['teachers']).iloc[mask], use_container_width=True)
+    else:
+        accounts_df = load_view(views['accounts'])
+        # Format amounts in the browser instead of stringifying every cell
+        # (printf "%d" shows whole rupees like format_indian_currency, but without lakh/crore commas)
+        column_config = {
+            col: st.column_config.NumberColumn(col, format="₹%d")
+            for col in currency_columns(accounts_df)
+        }
+        st.dataframe(accounts_df.iloc[mask], column_config=column_config, use_container_width=True)
+
 def main():
     st.title("🎓 Fee Defaulter Finder")
     st.markdown("### Excel Group of Schools - Fee Management System")
@@ -399,6 +671,8 @@ def main():
         st.session_state.initial_fee_processed = False
         st.session_state.initial_fee_results = None
         st.session_state.initial_fee_zip_data = None
+        st.session_state.initial_fee_stats = None
+        st.session_state.initial_fee_names_lower = None
     
     # Sidebar
     with st.sidebar:
@@ -439,6 +713,8 @@ def main():
                 st.session_state.initial_fee_processed = False
                 st.session_state.initial_fee_results = None
                 st.session_state.initial_fee_zip_data = None
+                st.session_state.initial_fee_stats = None
+                st.session_state.initial_fee_names_lower = None
                 st.rerun()
         
         st.divider()
@@ -483,12 +759,14 @@ def main():
     if initial_fee_button and contacts_file and invoices_file and payments_file:
         with st.spinner("Processing initial fee and opening balance defaulters..."):
             try:
-                initial_fee_results, initial_fee_zip_data = process_initial_fee_defaulters(contacts_file, invoices_file, payments_file)
+                initial_fee_results, initial_fee_zip_data, initial_fee_stats = process_initial_fee_defaulters(contacts_file, invoices_file, payments_file)
 
                 # Store in session state
                 st.session_state.initial_fee_processed = True
                 st.session_state.initial_fee_results = initial_fee_results
                 st.session_state.initial_fee_zip_data = initial_fee_zip_data
+                st.session_state.initial_fee_stats = initial_fee_stats
+                st.session_state.initial_fee_names_lower = None
 
                 st.success("✅ Initial fee and opening balance defaulters processed successfully!")
                 st.rerun()
@@ -512,22 +790,17 @@ def main():
         )
 
         # Display summary metrics
+        initial_fee_stats = st.session_state.initial_fee_stats
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            total_defaulters = len(initial_fee_results)
-            st.metric("Total Defaulters", total_defaulters)
+            st.metric("Total Defaulters", initial_fee_stats['total_defaulters'])
         with col2:
-            fee_defaulters = len(initial_fee_results[initial_fee_results['Status'] == 'Initial Fee Not Paid'])
-            st.metric("Initial Fee Defaulters", fee_defaulters)
+            st.metric("Initial Fee Defaulters", initial_fee_stats['fee_defaulters'])
         with col3:
-            opening_balance_defaulters = len(initial_fee_results[initial_fee_results['Status'] == 'Opening Balance Not Fully Paid'])
-            st.metric("Opening Balance Defaulters", opening_balance_defaulters)
+            st.metric("Opening Balance Defaulters", initial_fee_stats['opening_balance_defaulters'])
         with col4:
-            if opening_balance_defaulters > 0:
-                total_outstanding = initial_fee_results[
-                    initial_fee_results['Status'] == 'Opening Balance Not Fully Paid'
-                ]['Remaining Opening Balance'].sum()
-                st.metric("Total Outstanding Balance", f"₹{total_outstanding:,.0f}")
+            if initial_fee_stats['opening_balance_defaulters'] > 0:
+                st.metric("Total Outstanding Balance", f"₹{initial_fee_stats['total_outstanding']:,.0f}")
             else:
                 st.metric("Total Outstanding Balance", "₹0")
 
@@ -539,42 +812,20 @@ def main():
         with col1:
             selected_school = st.selectbox(
                 "Filter by School:",
-                ["All Schools"] + sorted(list(initial_fee_results['School'].unique())),
+                ["All Schools"] + list(initial_fee_results['School'].cat.categories),
                 key="school_filter_initial"
             )
         with col2:
             selected_status = st.selectbox(
                 "Filter by Status:",
-                ["All"] + sorted(list(initial_fee_results['Status'].unique())),
+                ["All"] + list(initial_fee_results['Status'].cat.categories),
                 key="status_filter_initial"
             )
         with col3:
-            # Get unique grades and sort them properly
-            all_grades = list(initial_fee_results['Grade'].unique())
-
-            # Define grade ordering function
-            def grade_sort_key(grade):
-                if grade == 'Pre-KG':
-                    return (0, 0)
-                elif grade == 'LKG':
-                    return (1, 0)
-                elif grade == 'UKG':
-                    return (2, 0)
-                elif grade.startswith('Grade '):
-                    try:
-                        grade_num = int(grade.replace('Grade ', ''))
-                        return (3, grade_num)
-                    except ValueError:
-                        return (4, grade)
-                else:
-                    return (4, grade)
-
-            # Sort grades in proper order
-            selected_grades = sorted(all_grades, key=grade_sort_key)
-
+            # Grade categories are already in proper grade order
             selected_grade = st.selectbox(
                 "Filter by Grade:",
-                ["All Grades"] + selected_grades,
+                ["All Grades"] + list(initial_fee_results['Grade'].cat.categories),
                 key="grade_filter_initial"
             )
 
@@ -588,29 +839,36 @@ def main():
 
         st.markdown("---")
 
-        # Apply filters
-        filtered_results = initial_fee_results.copy()
+        # Apply filters: compose one boolean mask and index the results once
+        mask = np.ones(len(initial_fee_results), dtype=bool)
         if selected_school != "All Schools":
-            filtered_results = filtered_results[filtered_results['School'] == selected_school]
+            mask &= initial_fee_results['School'].values == selected_school
         if selected_status != "All":
-            filtered_results = filtered_results[filtered_results['Status'] == selected_status]
+            mask &= initial_fee_results['Status'].values == selected_status
         if selected_grade != "All Grades":
-            filtered_results = filtered_results[filtered_results['Grade'] == selected_grade]
+            mask &= initial_fee_results['Grade'].values == selected_grade
 
         # Apply search filter
         if search_query and search_query.strip():
-            search_term = search_query.strip().lower()
-            filtered_results = filtered_results[
-                filtered_results['Student Name'].str.lower().str.contains(search_term, na=False)
-            ]
+            search_term = search_query.strip().casefold()
+            # Case-fold the names once per result set, not on every keystroke
+            names_lower = st.session_state.get('initial_fee_names_lower')
+            if names_lower is None:
+                names_lower = initial_fee_results['Student Name'].fillna('').str.casefold().to_numpy(dtype=str)
+                st.session_state.initial_fee_names_lower = names_lower
+            # Only scan names of rows the filters above kept
+            candidates = np.flatnonzero(mask)
+            mask[candidates] = np.char.find(names_lower[candidates], search_term) >= 0
+
+        filtered_results = initial_fee_results.iloc[mask]
 
         # Display the filtered results
         if not filtered_results.empty:
-            # Format numeric columns for display
-            display_df = filtered_results.copy()
-            display_df['Opening Balance'] = display_df['Opening Balance'].apply(lambda x: f"₹{x:,.2f}" if x > 0 else "-")
-            display_df['Total Paid Opening Balance'] = display_df['Total Paid Opening Balance'].apply(lambda x: f"₹{x:,.2f}" if x > 0 else "-")
-            display_df['Remaining Opening Balance'] = display_df['Remaining Opening Balance'].apply(lambda x: f"₹{x:,.2f}" if x > 0 else "-")
+            # Format numeric columns for display (assign returns a new frame, so no separate copy)
+            display_df = filtered_results.assign(**{
+                col: format_rupee_series(filtered_results[col])
+                for col in ['Opening Balance', 'Total Paid Opening Balance', 'Remaining Opening Balance']
+            })
 
             st.dataframe(
                 display_df[['Customer ID', 'Student Name', 'School', 'Grade', 'Section', 'Status',
@@ -640,218 +898,19 @@ def main():
         # Tabs for each school and payment analytics
         tab1, tab2, tab3 = st.tabs(["Excel Central School", "Excel Global School", "💰 Payment Analytics"])
         
+        school_stats = st.session_state.school_stats
+        
         with tab1:
-            if not results['Excel Central School'].empty:
-                summary = results['Excel Central School']
-                
-                # Metrics
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    total_in_school = st.session_state.school_stats['Excel Central School']['total_students'] if st.session_state.school_stats else len(summary)
-                    st.metric("Total Students", total_in_school)
-                with col2:
-                    defaulters = len(summary[summary['Total Outstanding'] > 0])
-                    st.metric("Defaulters", defaulters)
-                with col3:
-                    st.metric("Total Outstanding", format_indian_currency(summary['Total Outstanding'].sum()))
-                with col4:
-                    st.metric("Grades Affected", summary['Grade'].nunique())
-                        
-                # Visualizations
-                st.divider()
-                total_students = st.session_state.school_stats['Excel Central School']['total_students'] if st.session_state.school_stats else None
-                fig_pie, fig_bar, fig_amount = create_visualizations(summary, "Excel Central School", total_students)
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                with col2:
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                
-                st.plotly_chart(fig_amount, use_container_width=True)
-                        
-                # Data table with filters
-                st.divider()
-                st.subheader("📋 Defaulter Details")
-                
-                # Search bar
-                search_query = st.text_input(
-                    "🔍 Search by Student Name",
-                    placeholder="Type student name to search...",
-                    key="ecs_search"
-                )
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    selected_grade = st.selectbox(
-                        "Filter by Grade",
-                        ["All"] + sorted(summary['Grade'].unique().tolist()),
-                        key="ecs_grade"
-                    )
-                with col2:
-                    selected_section = st.selectbox(
-                        "Filter by Section",
-                        ["All"] + sorted(summary['Section'].unique().tolist()),
-                        key="ecs_section"
-                    )
-                with col3:
-                    view_type = st.selectbox(
-                        "View Type",
-                        ["Teachers View", "Accounts View"],
-                        key="ecs_view"
-                    )
-                
-                # Filter data
-                filtered_data = summary.copy()
-                
-                # Apply search filter
-                if search_query:
-                    filtered_data = filtered_data[
-                        filtered_data['Student Name'].str.contains(search_query, case=False, na=False)
-                    ]
-                
-                if selected_grade != "All":
-                    filtered_data = filtered_data[filtered_data['Grade'] == selected_grade]
-                if selected_section != "All":
-                    filtered_data = filtered_data[filtered_data['Section'] == selected_section]
-                
-                # Display appropriate view
-                if view_type == "Teachers View":
-                    # Get fee columns from the actual data
-                    fee_columns = [col for col in filtered_data.columns 
-                                 if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
-                                               'Grade', 'Section', 'Total Outstanding']]
-                    display_cols = ['Student Name', 'Enrollment No', 'Grade', 'Section']
-                    for col in fee_columns:
-                        if col in filtered_data.columns:
-                            filtered_data[col] = filtered_data[col].apply(
-                                lambda x: 'Unpaid' if x > 0 else 'Paid'
-                            )
-                            display_cols.append(col)
-                    st.dataframe(filtered_data[display_cols], use_container_width=True)
-                else:
-                    # Format currency columns for display
-                    display_data = filtered_data.copy()
-                    currency_cols = [col for col in display_data.columns 
-                                   if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
-                                                 'Grade', 'Section']]
-                    for col in currency_cols:
-                        if col in display_data.columns and display_data[col].dtype in ['int64', 'float64']:
-                            display_data[col] = display_data[col].apply(
-                                lambda x: format_indian_currency(x) if x > 0 else '₹0' if x == 0 else ''
-                            )
-                    st.dataframe(display_data, use_container_width=True)
-            else:
-                st.info("No defaulters found for Excel Central School")
+            render_school_tab('Excel Central School', results['Excel Central School'], school_stats['Excel Central School'])
         
         with tab2:
-            if not results['Excel Global School'].empty:
-                summary = results['Excel Global School']
-                
-                # Metrics
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    total_in_school = st.session_state.school_stats['Excel Global School']['total_students'] if st.session_state.school_stats else len(summary)
-                    st.metric("Total Students", total_in_school)
-                with col2:
-                    defaulters = len(summary[summary['Total Outstanding'] > 0])
-                    st.metric("Defaulters", defaulters)
-                with col3:
-                    st.metric("Total Outstanding", format_indian_currency(summary['Total Outstanding'].sum()))
-                with col4:
-                    st.metric("Grades Affected", summary['Grade'].nunique())
-                        
-                # Visualizations
-                st.divider()
-                total_students = st.session_state.school_stats['Excel Global School']['total_students'] if st.session_state.school_stats else None
-                fig_pie, fig_bar, fig_amount = create_visualizations(summary, "Excel Global School", total_students)
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                with col2:
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                
-                st.plotly_chart(fig_amount, use_container_width=True)
-                
-                # Data table with filters
-                st.divider()
-                st.subheader("📋 Defaulter Details")
-                
-                # Search bar
-                search_query = st.text_input(
-                    "🔍 Search by Student Name",
-                    placeholder="Type student name to search...",
-                    key="egs_search"
-                )
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    selected_grade = st.selectbox(
-                        "Filter by Grade",
-                        ["All"] + sorted(summary['Grade'].unique().tolist()),
-                        key="egs_grade"
-                    )
-                with col2:
-                    selected_section = st.selectbox(
-                        "Filter by Section",
-                        ["All"] + sorted(summary['Section'].unique().tolist()),
-                        key="egs_section"
-                    )
-                with col3:
-                    view_type = st.selectbox(
-                        "View Type",
-                        ["Teachers View", "Accounts View"],
-                        key="egs_view"
-                    )
-                
-                # Filter data
-                filtered_data = summary.copy()
-                
-                # Apply search filter
-                if search_query:
-                    filtered_data = filtered_data[
-                        filtered_data['Student Name'].str.contains(search_query, case=False, na=False)
-                    ]
-                
-                if selected_grade != "All":
-                    filtered_data = filtered_data[filtered_data['Grade'] == selected_grade]
-                if selected_section != "All":
-                    filtered_data = filtered_data[filtered_data['Section'] == selected_section]
-                
-                # Display appropriate view
-                if view_type == "Teachers View":
-                    # Get fee columns from the actual data
-                    fee_columns = [col for col in filtered_data.columns 
-                                 if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
-                                               'Grade', 'Section', 'Total Outstanding']]
-                    display_cols = ['Student Name', 'Enrollment No', 'Grade', 'Section']
-                    for col in fee_columns:
-                        if col in filtered_data.columns:
-                            filtered_data[col] = filtered_data[col].apply(
-                                lambda x: 'Unpaid' if x > 0 else 'Paid'
-                            )
-                            display_cols.append(col)
-                    st.dataframe(filtered_data[display_cols], use_container_width=True)
-                else:
-                    # Format currency columns for display
-                    display_data = filtered_data.copy()
-                    currency_cols = [col for col in display_data.columns 
-                                   if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
-                                                 'Grade', 'Section']]
-                    for col in currency_cols:
-                        if col in display_data.columns and display_data[col].dtype in ['int64', 'float64']:
-                            display_data[col] = display_data[col].apply(
-                                lambda x: format_indian_currency(x) if x > 0 else '₹0' if x == 0 else ''
-                            )
-                    st.dataframe(display_data, use_container_width=True)
-            else:
-                st.info("No defaulters found for Excel Global School")
+            render_school_tab('Excel Global School', results['Excel Global School'], school_stats['Excel Global School'])
         
         with tab3:
             # Payment Analytics Tab
             if st.session_state.payment_analytics and st.session_state.payment_analytics is not None:
                 analytics = st.session_state.payment_analytics
+                import plotly.express as px
                 
                 st.markdown("## 📊 Payment Collections Dashboard")
                 st.info("ℹ️ **Note:** 'Paid' students include those with zero outstanding balance and those not yet invoiced.")
@@ -894,30 +953,25 @@ def main():
                 
                 st.markdown("---")
                 
-                # Define proper grade order for charts
-                grade_order = ['Pre-KG', 'LKG', 'UKG'] + [f'Grade {str(i).zfill(2)}' for i in range(1, 13)]
-                
                 # School-wise collection comparison
                 st.subheader("📊 School-wise Collections")
                 
-                school_data = pd.DataFrame(list(analytics['school_totals'].items()), 
-                                          columns=['School', 'Total Collections'])
+                # Two schools only - hand plotly plain lists with Indian currency labels
+                schools = list(analytics['school_totals'].keys())
+                totals = list(analytics['school_totals'].values())
                 fig_school = px.bar(
-                    school_data,
-                    x='School',
-                    y='Total Collections',
+                    x=schools,
+                    y=totals,
                     title='Total Collections by School',
-                    color='School',
+                    color=schools,
                     color_discrete_map={
                         'Excel Central School': '#FF6B6B',
                         'Excel Global School': '#4ECDC4'
                     },
-                    text='Total Collections'
+                    labels={'x': 'School', 'y': 'Total Collections', 'color': 'School'},
+                    text=[format_indian_currency(total) for total in totals]
                 )
-                # Format text for Indian currency
-                school_data['Formatted_Total'] = school_data['Total Collections'].apply(format_indian_currency)
                 fig_school.update_traces(
-                    text=school_data['Formatted_Total'],
                     texttemplate='%{text}',
                     textposition='outside'
                 )
@@ -937,13 +991,9 @@ def main():
                 with school_tab1:
                     ecs_grades = analytics['grade_payments'][
                         analytics['grade_payments']['School'] == 'Excel Central School'
-                    ].copy()
+                    ]
                     
                     if not ecs_grades.empty:
-                        # Sort by grade order
-                        ecs_grades['Grade_Order'] = ecs_grades['Grade'].map({grade: i for i, grade in enumerate(grade_order)})
-                        ecs_grades = ecs_grades.sort_values('Grade_Order')
-                        
                         fig_ecs = px.bar(
                             ecs_grades,
                             x='Grade',
@@ -954,9 +1004,8 @@ def main():
                             text='Total'
                         )
                         # Format text for Indian currency
-                        ecs_grades['Formatted_Total'] = ecs_grades['Total'].apply(format_indian_currency)
                         fig_ecs.update_traces(
-                            text=ecs_grades['Formatted_Total'],
+                            text=format_indian_series(ecs_grades['Total']),
                             texttemplate='%{text}',
                             textposition='outside'
                         )
@@ -966,8 +1015,9 @@ def main():
                             yaxis_title='Amount (₹)',
                             showlegend=False
                         )
+                        present_grades = set(ecs_grades['Grade'])
                         fig_ecs.update_xaxes(categoryorder='array', 
-                                           categoryarray=[g for g in grade_order if g in ecs_grades['Grade'].values])
+                                           categoryarray=[g for g in GRADE_ORDER if g in present_grades])
                         st.plotly_chart(fig_ecs, use_container_width=True)
                     else:
                         st.info("No collection data available for Excel Central School")
@@ -975,13 +1025,9 @@ def main():
                 with school_tab2:
                     egs_grades = analytics['grade_payments'][
                         analytics['grade_payments']['School'] == 'Excel Global School'
-                    ].copy()
+                    ]
                     
                     if not egs_grades.empty:
-                        # Sort by grade order
-                        egs_grades['Grade_Order'] = egs_grades['Grade'].map({grade: i for i, grade in enumerate(grade_order)})
-                        egs_grades = egs_grades.sort_values('Grade_Order')
-                        
                         fig_egs = px.bar(
                             egs_grades,
                             x='Grade',
@@ -992,9 +1038,8 @@ def main():
                             text='Total'
                         )
                         # Format text for Indian currency
-                        egs_grades['Formatted_Total'] = egs_grades['Total'].apply(format_indian_currency)
                         fig_egs.update_traces(
-                            text=egs_grades['Formatted_Total'],
+                            text=format_indian_series(egs_grades['Total']),
                             texttemplate='%{text}',
                             textposition='outside'
                         )
@@ -1004,8 +1049,9 @@ def main():
                             yaxis_title='Amount (₹)',
                             showlegend=False
                         )
+                        present_grades = set(egs_grades['Grade'])
                         fig_egs.update_xaxes(categoryorder='array', 
-                                           categoryarray=[g for g in grade_order if g in egs_grades['Grade'].values])
+                                           categoryarray=[g for g in GRADE_ORDER if g in present_grades])
                         st.plotly_chart(fig_egs, use_container_width=True)
                     else:
                         st.info("No collection data available for Excel Global School")
@@ -1014,10 +1060,10 @@ def main():
                 if not analytics['monthly_payments'].empty:
                     st.subheader("📅 Monthly Collection Trends")
                     
-                    monthly_data = analytics['monthly_payments'].copy()
-                    # Convert Month back to datetime for proper sorting
-                    monthly_data['Month_Date'] = pd.to_datetime(monthly_data['Month'], format='%B %Y')
-                    monthly_data = monthly_data.sort_values('Month_Date')
+                    # Already in month order; add Indian currency hover labels, sliced per school trace by plotly
+                    monthly_data = analytics['monthly_payments'].assign(
+                        Formatted=lambda d: format_indian_series(d['Total'])
+                    )
                     
                     fig_monthly = px.line(
                         monthly_data,
@@ -1026,6 +1072,7 @@ def main():
                         color='School',
                         title='Monthly Collections Trend',
                         markers=True,
+                        custom_data=['Formatted'],
                         color_discrete_map={
                             'Excel Central School': '#FF6B6B',
                             'Excel Global School': '#4ECDC4'
@@ -1035,10 +1082,8 @@ def main():
                     y_min = monthly_data['Total'].min()
                     y_max = monthly_data['Total'].max()
                     
-                    # Generate tick values
-                    import numpy as np
-                    tick_vals = np.linspace(0, y_max * 1.1, 6)
-                    tick_texts = [format_indian_currency(val) for val in tick_vals]
+                    # Generate tick values (cached per y_max across reruns)
+                    tick_vals, tick_texts = currency_ticks(float(y_max))
                     
                     fig_monthly.update_layout(
                         height=400,
@@ -1052,11 +1097,7 @@ def main():
                         )
                     )
                     # Update hover template to show Indian currency format
-                    for trace in fig_monthly.data:
-                        school_data_hover = monthly_data[monthly_data['School'] == trace.name]
-                        hover_texts = [format_indian_currency(val) for val in school_data_hover['Total']]
-                        trace.hovertemplate = '%{x}<br>%{customdata}<extra></extra>'
-                        trace.customdata = hover_texts
+                    fig_monthly.update_traces(hovertemplate='%{x}<br>%{customdata[0]}<extra></extra>')
                     st.plotly_chart(fig_monthly, use_container_width=True)
                 
                 # Summary statistics
@@ -1071,8 +1112,8 @@ def main():
                     st.info(f"**Fully Paid Students:** {total_fully_paid}\n- With invoices: {actual_paid_with_inv}\n- Not yet invoiced: {total_without_inv}")
                 
                 with col2:
-                    st.info(f"**Highest Single Payment:** {format_indian_currency(analytics['paid_invoices']['Total'].max())}")
-                    st.info(f"**Lowest Single Payment:** {format_indian_currency(analytics['paid_invoices']['Total'].min())}")
+                    st.info(f"**Highest Single Payment:** {format_indian_currency(analytics['paid_stats']['max'])}")
+                    st.info(f"**Lowest Single Payment:** {format_indian_currency(analytics['paid_stats']['min'])}")
                 
                 # Payment Summary Table by Grade and Section
                 st.subheader("📊 Payment Summary by Grade & Section")
@@ -1093,87 +1134,29 @@ def create_payment_summary_table(school_name, analytics, session_state):
     """Create payment summary table for a school"""
     import pandas as pd
     
-    # Get data for this school
-    school_paid = analytics['students_paid_by_section'][
-        analytics['students_paid_by_section']['School'] == school_name
-    ].copy()
-    
-    # Load contacts data to get total students per section
-    try:
-        contacts_df = pd.read_csv('input/Contacts.csv')
-        school_contacts = contacts_df[contacts_df['School'] == school_name].copy()
-        
-        # Get total students by grade and section
-        total_by_section = school_contacts.groupby(['Grade', 'Section'])['Contact ID'].nunique().reset_index()
-        total_by_section.columns = ['Grade', 'Section', 'Total_Students']
-        
-        # Merge with paid students data - use outer join to include all sections
-        summary_data = pd.merge(
-            total_by_section,
-            school_paid[['Grade', 'Section', 'Students_Paid']],
-            on=['Grade', 'Section'],
-            how='left'
-        ).fillna(0)
-        
-        summary_data['Students_Paid'] = summary_data['Students_Paid'].astype(int)
-        summary_data['Total_Students'] = summary_data['Total_Students'].astype(int)
-        
-    except Exception as e:
-        st.error(f"Error loading contacts data: {e}")
+    # Grade/section totals and paid counts for this school, precomputed with the analytics
+    summary_data = analytics['section_summary'].get(school_name)
+    if summary_data is None:
+        st.info(f"No contacts found for {school_name}")
         return
     
-    # Define grade order
-    grade_order = ['Pre-KG', 'LKG', 'UKG'] + [f'Grade {str(i).zfill(2)}' for i in range(1, 13)]
-    
-    # Get unique sections for this school
-    all_sections = sorted(summary_data['Section'].unique())
-    
-    # Create pivot table
-    pivot_data = []
-    grand_total_paid = 0
-    grand_total_students = 0
-    
-    for grade in grade_order:
-        if grade in summary_data['Grade'].values:
-            grade_data = summary_data[summary_data['Grade'] == grade]
-            row = {'Grade': grade}
-            
-            grade_total_paid = 0
-            grade_total_students = 0
-            
-            for section in all_sections:
-                section_data = grade_data[grade_data['Section'] == section]
-                if not section_data.empty:
-                    paid = int(section_data['Students_Paid'].values[0])
-                    total = int(section_data['Total_Students'].values[0])
-                    row[section] = f"{paid}/{total}"
-                    grade_total_paid += paid
-                    grade_total_students += total
-                else:
-                    row[section] = "0/0"
-            
-            row['Total'] = f"{grade_total_paid}/{grade_total_students}"
-            grand_total_paid += grade_total_paid
-            grand_total_students += grade_total_students
-            pivot_data.append(row)
-    
-    # Add grand total row
-    if pivot_data:
-        grand_total_row = {'Grade': 'GRAND TOTAL'}
-        for section in all_sections:
-            section_total_paid = summary_data[summary_data['Section'] == section]['Students_Paid'].sum()
-            section_total_students = summary_data[summary_data['Section'] == section]['Total_Students'].sum()
-            grand_total_row[section] = f"{int(section_total_paid)}/{int(section_total_students)}"
-        grand_total_row['Total'] = f"{grand_total_paid}/{grand_total_students}"
-        pivot_data.append(grand_total_row)
+    # Pivot paid and total counts into grade x section grids (sections sorted, missing cells 0)
+    paid = summary_data.pivot_table(index='Grade', columns='Section', values='Students_Paid', aggfunc='sum', fill_value=0).astype(int)
+    totals = summary_data.pivot_table(index='Grade', columns='Section', values='Total_Students', aggfunc='sum', fill_value=0).astype(int)
+    grades = [grade for grade in GRADE_ORDER if grade in paid.index]
     
     # Create DataFrame
-    if pivot_data:
-        display_df = pd.DataFrame(pivot_data)
+    if grades:
+        grade_paid = paid.loc[grades]
+        grade_totals = totals.loc[grades]
+        grand_total_paid = int(grade_paid.to_numpy().sum())
+        grand_total_students = int(grade_totals.to_numpy().sum())
         
-        # Reorder columns: Grade, then sections, then Total
-        cols = ['Grade'] + all_sections + ['Total']
-        display_df = display_df[cols]
+        # Format "paid/total" cells, then Total column and grand total row
+        display_df = grade_paid.astype(str) + '/' + grade_totals.astype(str)
+        display_df['Total'] = grade_paid.sum(axis=1).astype(str) + '/' + grade_totals.sum(axis=1).astype(str)
+        display_df.loc['GRAND TOTAL'] = (paid.sum().astype(str) + '/' + totals.sum().astype(str)).tolist() + [f"{grand_total_paid}/{grand_total_students}"]
+        display_df = display_df.rename_axis(index='Grade', columns=None).reset_index()
         
         # Style the dataframe
         def highlight_grand_total(row):
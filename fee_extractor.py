@@ -1,24 +1,95 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, date
+from datetime import date
+from bisect import bisect_right
 import os
+import csv
+import io
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+# Use PyArrow's multithreaded CSV parser when available, otherwise the C parser in a single pass
+try:
+    import pyarrow  # noqa: F401
+    CSV_READ_OPTIONS = {'engine': 'pyarrow'}
+except ImportError:
+    CSV_READ_OPTIONS = {'engine': 'c', 'low_memory': False}
+
+# Columns the extractors use; export columns outside these are skipped while parsing
+CONTACT_COLUMNS = [
+    'Contact ID', 'First Name', 'Last Name', 'CF.Enrollment Code',
+    'School', 'Grade', 'Section', 'Opening Balance'
+]
+INVOICE_COLUMNS = [
+    'Invoice Number', 'Customer ID', 'Invoice Status', 'Due Date', 'School',
+    'Grade', 'Section', 'Item Name', 'Item Total', 'Balance'
+]
+
+def present_columns(source, columns):
+    """Those of columns found in a CSV's header (file order), rewinding file-like sources after peeking"""
+    header = pd.read_csv(source, nrows=0, encoding='utf-8', encoding_errors='replace').columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return [col for col in header if col in columns]
+
+# Section reports are usually a few dozen rows, where to_csv's per-call setup outweighs the writing
+SMALL_CSV_ROWS = 500
+
+def frame_to_csv(df, path=None):
+    """Write df like to_csv(index=False), via csv.writer for small frames; returns the text if no path is given"""
+    # csv.writer would write missing values as 'nan' rather than an empty field, so leave those to to_csv
+    if len(df) >= SMALL_CSV_ROWS or df.isna().to_numpy().any():
+        return df.to_csv(path, index=False)
+    buffer = io.StringIO() if path is None else open(path, 'w', newline='', encoding='utf-8')
+    with buffer:
+        # Same line endings as to_csv, which defaults to os.linesep
+        writer = csv.writer(buffer, lineterminator=os.linesep)
+        writer.writerow(df.columns)
+        writer.writerows(df.itertuples(index=False, name=None))
+        if path is None:
+            return buffer.getvalue()
+
+# Amount columns are always numeric and Invoice Status is a handful of repeated labels;
+# declaring them skips type inference and makes status checks compare category codes
+INVOICE_DTYPES = {'Balance': 'float64', 'Item Total': 'float64', 'Invoice Status': 'category'}
+
+# Fee columns in the order they fall due, with the first day each is due; get_due_fees_columns
+# bisects the dates instead of rebuilding and comparing them on every call
+EGS_SCHEDULE = (
+    ('Term I', date(2025, 6, 1)),
+    ('Term II', date(2025, 9, 1)),
+    ('Term III', date(2026, 1, 1))
+)
+ECS_SCHEDULE = tuple(
+    (f"{month[:3]}-{year}", date(year, month_num, 1))
+    for month, month_num, year in [
+        ('June', 6, 2025), ('July', 7, 2025), ('August', 8, 2025),
+        ('September', 9, 2025), ('October', 10, 2025), ('November', 11, 2025),
+        ('December', 12, 2025), ('January', 1, 2026), ('February', 2, 2026),
+        ('March', 3, 2026)
+    ]
+)
+EGS_DUE_DATES = tuple(due for _, due in EGS_SCHEDULE)
+ECS_DUE_DATES = tuple(due for _, due in ECS_SCHEDULE)
+
 class FeeDefaulterExtractor:
     def __init__(self, contacts_path, invoices_path, output_base_path):
         """
         Initialize the Fee Defaulter Extractor
         
         Args:
-            contacts_path: Path to Contacts.csv
-            invoices_path: Path to Invoice.csv
+            contacts_path: Path to Contacts.csv (or a file-like object)
+            invoices_path: Path to Invoice.csv (or a file-like object)
             output_base_path: Base path for output folders
         """
         self.contacts_path = contacts_path
         self.invoices_path = invoices_path
         self.output_base_path = output_base_path
+        self.contacts_df = None
+        self.invoices_df = None
+        self.paid_fee_types = None
         self.today = date.today()
         
         # Define fee structures for each school
@@ -34,13 +105,86 @@ class FeeDefaulterExtractor:
             'November', 'December', 'January', 'February', 'March'
         ]
         
+        # Item name fragment -> fee column per school, in extract_fee_type's priority order
+        self.fee_type_labels = {
+            'Excel Global School': dict(self.excel_global_fees),
+            'Excel Central School': {
+                'Initial Academic Fee': 'Initial Fee',
+                **{
+                    f"{month} Monthly Fee": f"{month[:3]}-{2026 if month in ['January', 'February', 'March'] else 2025}"
+                    for month in self.excel_central_months
+                }
+            }
+        }
+        
+    @classmethod
+    def from_dataframes(cls, contacts_df, invoices_df, output_base_path=None):
+        """Create an extractor over already-parsed contacts and invoices (load_data then skips reading)"""
+        extractor = cls(contacts_path=None, invoices_path=None, output_base_path=output_base_path)
+        extractor.contacts_df = contacts_df
+        extractor.invoices_df = invoices_df
+        return extractor
+        
+    def read_csv(self, source, **kwargs):
+        """Read a CSV as UTF-8, falling back to Latin-1 for legacy exports"""
+        try:
+            df = pd.read_csv(source, encoding='utf-8', **kwargs, **CSV_READ_OPTIONS)
+            # PyArrow keeps undecodable text columns as raw bytes instead of raising
+            undecoded = any(
+                isinstance(df[col].at[first], bytes)
+                for col in df.select_dtypes(include='object')
+                if (first := df[col].first_valid_index()) is not None
+            )
+            if not undecoded:
+                return df
+        except UnicodeDecodeError:
+            pass
+        
+        print("Input is not valid UTF-8, re-reading as Latin-1")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, encoding='latin-1', **kwargs, **CSV_READ_OPTIONS)
+        
     def load_data(self):
         """Load contacts and invoices data"""
+        if self.contacts_df is not None and self.invoices_df is not None:
+            print(f"Using {len(self.contacts_df)} preloaded contacts and {len(self.invoices_df)} invoices")
+            if 'Fee Type' not in self.invoices_df.columns:
+                self.annotate_fee_types()
+            if 'Customer Code' not in self.invoices_df.columns or 'Customer Code' not in self.contacts_df.columns:
+                self.annotate_customer_codes()
+            return
         print("Loading data files...")
-        self.contacts_df = pd.read_csv(self.contacts_path)
-        self.invoices_df = pd.read_csv(self.invoices_path)
+        self.contacts_df = self.read_csv(self.contacts_path, usecols=present_columns(self.contacts_path, CONTACT_COLUMNS))
+        self.invoices_df = self.read_csv(
+            self.invoices_path, usecols=present_columns(self.invoices_path, INVOICE_COLUMNS), dtype=INVOICE_DTYPES
+        )
+        # Parse due dates once here rather than on every process_invoices call
+        if 'Due Date' in self.invoices_df.columns:
+            self.invoices_df['Due Date'] = pd.to_datetime(self.invoices_df['Due Date'], errors='coerce')
+        self.annotate_fee_types()
+        self.annotate_customer_codes()
         print(f"Loaded {len(self.contacts_df)} contacts and {len(self.invoices_df)} invoices")
         
+    def annotate_fee_types(self):
+        """Classify every invoice line's fee type once, as a Fee Type column on invoices_df"""
+        fee_types = pd.Series(np.nan, index=self.invoices_df.index, dtype=object)
+        for school in self.fee_type_labels:
+            in_school = (self.invoices_df['School'] == school).to_numpy()
+            fee_types[in_school] = self.extract_fee_types(self.invoices_df.loc[in_school, 'Item Name'], school).to_numpy()
+        self.invoices_df['Fee Type'] = fee_types
+        
+    def annotate_customer_codes(self):
+        """Factorize Contact ID and Customer ID together into a shared int32 Customer Code column on both frames"""
+        # Joins and isin on these codes compare integers instead of hashing ID strings
+        codes, _ = pd.factorize(
+            pd.concat([self.contacts_df['Contact ID'], self.invoices_df['Customer ID']], ignore_index=True),
+            use_na_sentinel=False
+        )
+        codes = codes.astype('int32')
+        self.contacts_df['Customer Code'] = codes[:len(self.contacts_df)]
+        self.invoices_df['Customer Code'] = codes[len(self.contacts_df):]
+        
     def get_due_fees_columns(self, school, overdue_fee_types=None):
         """
         Get the fee columns that should be due by today's date or have overdue invoices
@@ -56,54 +200,42 @@ class FeeDefaulterExtractor:
         
         if school == 'Excel Global School':
             # Term-based fees - show if date reached OR if overdue invoices exist
-            if self.today >= date(2025, 6, 1) or (overdue_fee_types and 'Term I' in overdue_fee_types):
-                columns.append('Term I')
-            if self.today >= date(2025, 9, 1) or (overdue_fee_types and 'Term II' in overdue_fee_types):
-                columns.append('Term II')
-            if self.today >= date(2026, 1, 1) or (overdue_fee_types and 'Term III' in overdue_fee_types):
-                columns.append('Term III')
+            due = bisect_right(EGS_DUE_DATES, self.today)
+            columns.extend(label for label, _ in EGS_SCHEDULE[:due])
+            if overdue_fee_types:
+                columns.extend(label for label, _ in EGS_SCHEDULE[due:] if label in overdue_fee_types)
                 
         elif school == 'Excel Central School':
-            # Monthly fees
-            year = 2025
-            month_mapping = {
-                'June': (6, 2025), 'July': (7, 2025), 'August': (8, 2025),
-                'September': (9, 2025), 'October': (10, 2025), 'November': (11, 2025),
-                'December': (12, 2025), 'January': (1, 2026), 'February': (2, 2026),
-                'March': (3, 2026)
-            }
-            
-            for month_name in self.excel_central_months:
-                month_num, year = month_mapping[month_name]
-                if self.today >= date(year, month_num, 1):
-                    columns.append(f"{month_name[:3]}-{year}")
-                else:
-                    break
+            # Monthly fees - every month up to the first one not yet due
+            due = bisect_right(ECS_DUE_DATES, self.today)
+            columns.extend(label for label, _ in ECS_SCHEDULE[:due])
                     
         return columns
     
+    def get_paid_fee_types(self):
+        """(School, Customer ID) x Fee Type table of whether a Closed/Paid invoice exists, built on first use"""
+        if self.paid_fee_types is None:
+            paid_lines = self.invoices_df[self.invoices_df['Invoice Status'].isin(['Closed', 'Paid'])]
+            self.paid_fee_types = pd.crosstab([paid_lines['School'], paid_lines['Customer ID']], paid_lines['Fee Type']).gt(0)
+        return self.paid_fee_types
+    
     def process_invoices(self):
         """Process invoices to identify defaulters and handle duplicate balances"""
         print("Processing invoices...")
         
-        # Filter for overdue and partially paid invoices
-        defaulter_invoices = self.invoices_df[
-            (self.invoices_df['Invoice Status'].isin(['Overdue', 'PartiallyPaid']))
-        ].copy()
+        # Build the paid fee type table up front so per-school summaries only read it
+        self.get_paid_fee_types()
         
-        # For PartiallyPaid, check if past due date
-        if 'Due Date' in defaulter_invoices.columns:
-            defaulter_invoices['Due Date'] = pd.to_datetime(defaulter_invoices['Due Date'], errors='coerce')
-            today_datetime = pd.Timestamp(self.today)
-            
-            # Keep only PartiallyPaid that are past due date
-            partially_paid_mask = defaulter_invoices['Invoice Status'] == 'PartiallyPaid'
-            past_due_mask = defaulter_invoices['Due Date'] < today_datetime
-            
-            defaulter_invoices = defaulter_invoices[
-                (defaulter_invoices['Invoice Status'] == 'Overdue') |
-                (partially_paid_mask & past_due_mask)
-            ]
+        # Overdue invoices, plus PartiallyPaid ones past their due date, selected with one mask
+        status = self.invoices_df['Invoice Status']
+        partially_paid_mask = status == 'PartiallyPaid'
+        if 'Due Date' in self.invoices_df.columns:
+            # Already datetime when loaded via load_data, so this is a no-op there
+            due_dates = pd.to_datetime(self.invoices_df['Due Date'], errors='coerce')
+            partially_paid_mask &= due_dates < pd.Timestamp(self.today)
+            defaulter_invoices = self.invoices_df[(status == 'Overdue') | partially_paid_mask].assign(**{'Due Date': due_dates})
+        else:
+            defaulter_invoices = self.invoices_df[(status == 'Overdue') | partially_paid_mask]
         
         print(f"Found {len(defaulter_invoices)} overdue invoice line items")
         
@@ -111,21 +243,20 @@ class FeeDefaulterExtractor:
         unique_invoices = defaulter_invoices['Invoice Number'].nunique()
         print(f"Found {unique_invoices} unique overdue invoices")
         
-        # Merge with contacts to get student details
+        # Build student name and enrollment number once per contact (fewer rows than invoice lines)
+        student_details = pd.DataFrame({
+            'Customer Code': self.contacts_df['Customer Code'],
+            'Student Name': (
+                self.contacts_df['First Name'].fillna('') + ' ' + 
+                self.contacts_df['Last Name'].fillna('')
+            ).str.strip(),
+            'Enrollment No': self.contacts_df['CF.Enrollment Code']
+        })
+        
+        # Merge with contacts to get student details (unmatched invoices get blank details)
         defaulter_invoices = defaulter_invoices.merge(
-            self.contacts_df[['Contact ID', 'First Name', 'Last Name', 'CF.Enrollment Code']],
-            left_on='Customer ID',
-            right_on='Contact ID',
-            how='left'
-        )
-        
-        # Clean up student name
-        defaulter_invoices['Student Name'] = (
-            defaulter_invoices['First Name'].fillna('') + ' ' + 
-            defaulter_invoices['Last Name'].fillna('')
-        ).str.strip()
-        
-        defaulter_invoices['Enrollment No'] = defaulter_invoices['CF.Enrollment Code'].fillna('')
+            student_details, on='Customer Code', how='left', sort=False
+        ).fillna({'Student Name': '', 'Enrollment No': ''})
         
         # CRITICAL FIX: Allocate balance proportionally to each line item
         # Group by invoice to calculate proportional balance for each line item
@@ -171,6 +302,20 @@ class FeeDefaulterExtractor:
                         return f"{month[:3]}-{year}"
         return None
     
+    def extract_fee_types(self, item_names, school):
+        """Vectorized extract_fee_type over a Series of item names (NaN where nothing matches)"""
+        if school not in self.fee_type_labels:
+            return pd.Series(np.nan, index=item_names.index, dtype=object)
+        # Item names repeat heavily, so match each distinct name once and fan out by code (-1 = missing)
+        codes, names = pd.factorize(item_names)
+        names = pd.Series(names, dtype=object).astype(str)
+        matched = pd.Series(np.nan, index=names.index, dtype=object)
+        # Try fragments in priority order so a name mentioning two fees resolves like extract_fee_type
+        for fragment, label in self.fee_type_labels[school].items():
+            matched[matched.isna() & names.str.contains(fragment, regex=False)] = label
+        fee_types = np.append(matched.to_numpy(dtype=object), np.nan)
+        return pd.Series(fee_types[codes], index=item_names.index, dtype=object)
+    
     def create_student_summary(self, defaulter_invoices, school):
         """Create summary of defaulters by student"""
         print(f"Creating summary for {school}...")
@@ -178,108 +323,70 @@ class FeeDefaulterExtractor:
         # Filter for specific school
         school_invoices = defaulter_invoices[
             defaulter_invoices['School'] == school
-        ].copy()
+        ]
         
         if len(school_invoices) == 0:
             print(f"No defaulters found for {school}")
             return pd.DataFrame()
         
-        # Extract fee type
-        school_invoices['Fee Type'] = school_invoices['Item Name'].apply(
-            lambda x: self.extract_fee_type(x, school)
-        )
-        
         # Get unique fee types that have overdue invoices
         overdue_fee_types = set(school_invoices['Fee Type'].dropna().unique())
         
         # Get due fee columns for this school, including those with overdue invoices
         due_columns = self.get_due_fees_columns(school, overdue_fee_types)
         
-        # Get list of defaulter customer IDs
-        defaulter_ids = school_invoices['Customer ID'].unique()
+        # Group by student and grade/section
+        # IMPORTANT: Fill NaN sections before groupby to avoid pandas bug with NaN grouping
+        # (grouping on the filled Series keeps school_invoices a plain slice, no copy)
+        student_keys = [school_invoices['Customer ID'], school_invoices['Grade'], school_invoices['Section'].fillna('-')]
+        students = school_invoices.groupby(student_keys)[['Student Name', 'Enrollment No']].first()
+        if students.empty:
+            return pd.DataFrame()
         
-        # Now get ALL invoices for these defaulters to check complete payment status
-        all_invoices_for_defaulters = self.invoices_df[
-            (self.invoices_df['Customer ID'].isin(defaulter_ids)) &
-            (self.invoices_df['School'] == school)
-        ].copy()
+        # Overdue amount per student and fee column, using ALLOCATED BALANCE (proportional to item total)
+        overdue = (
+            school_invoices.groupby(student_keys + [school_invoices['Fee Type']], sort=False)['Allocated Balance'].sum()
+            .unstack('Fee Type')
+            .reindex(index=students.index, columns=due_columns)
+            .fillna(0)
+            .to_numpy()
+        )
         
-        all_invoices_for_defaulters['Fee Type'] = all_invoices_for_defaulters['Item Name'].apply(
-            lambda x: self.extract_fee_type(x, school)
+        # Whether ANY of the student's invoices (any grade/section) for a fee type is paid,
+        # looked up in the table process_invoices built instead of re-filtering all invoices
+        customer_ids = students.index.get_level_values('Customer ID')
+        has_closed = (
+            self.get_paid_fee_types()
+            .reindex(index=pd.MultiIndex.from_arrays([[school] * len(customer_ids), customer_ids]),
+                     columns=due_columns, fill_value=False)
+            .to_numpy()
         )
         
-        # Group by student and grade/section
-        # IMPORTANT: Fill NaN sections before groupby to avoid pandas bug with NaN grouping
-        school_invoices['Section'] = school_invoices['Section'].fillna('-')
-        
-        grouped = []
-        for (customer_id, grade, section), group in school_invoices.groupby(
-            ['Customer ID', 'Grade', 'Section']
-        ):
-            student_data = {
-                'Customer ID': customer_id,
-                'Student Name': group['Student Name'].iloc[0],
-                'Enrollment No': group['Enrollment No'].iloc[0],
-                'Grade': grade,
-                'Section': section if pd.notna(section) else '-'
-            }
-            
-            # Get all invoices for this student
-            student_all_invoices = all_invoices_for_defaulters[
-                all_invoices_for_defaulters['Customer ID'] == customer_id
-            ]
-            
-            # For each fee column, check payment status using ALLOCATED BALANCE
-            for col in due_columns:
-                # Use allocated balance for overdue items
-                overdue_fee_items = group[group['Fee Type'] == col]
-                if len(overdue_fee_items) > 0:
-                    # Use the allocated balance (proportional to item total)
-                    overdue_amount = overdue_fee_items['Allocated Balance'].sum()
-                else:
-                    overdue_amount = 0
-                
-                # Check if there are ANY invoices (paid or unpaid) for this fee type
-                all_fee_invoices = student_all_invoices[student_all_invoices['Fee Type'] == col]
-                
-                if len(all_fee_invoices) > 0:
-                    # Check if fee is paid
-                    has_closed = any(all_fee_invoices['Invoice Status'].isin(['Closed', 'Paid']))
-                    
-                    if overdue_amount > 0:
-                        # Has overdue amount
-                        student_data[col] = overdue_amount
-                    elif has_closed:
-                        # Fee has been paid
-                        student_data[col] = -1  # Use -1 to indicate paid
-                    else:
-                        # Has invoice but not overdue (future due date)
-                        student_data[col] = 0
-                else:
-                    # No invoice for this fee type
-                    student_data[col] = 0
-            
+        # Overdue amount if any, else -1 when the fee has been paid, else 0 (no invoice or not yet due)
+        summary_df = students.reset_index()[['Customer ID', 'Student Name', 'Enrollment No', 'Grade', 'Section']]
+        status = np.where(overdue > 0, overdue, np.where(has_closed, -1, 0))
+        total_outstanding = 0
+        for i, col in enumerate(due_columns):
+            # Columns without any overdue amount stay integer, as in the CSV reports
+            column = status[:, i] if (overdue[:, i] > 0).any() else status[:, i].astype(int)
+            summary_df[col] = column
             # Calculate total outstanding (only positive amounts, exclude -1 which means paid)
-            student_data['Total Outstanding'] = sum(
-                max(0, student_data[col]) for col in due_columns
-            )
-            
-            grouped.append(student_data)
+            total_outstanding = total_outstanding + np.maximum(column, 0)
+        summary_df['Total Outstanding'] = total_outstanding
         
-        return pd.DataFrame(grouped)
+        return summary_df
     
     def create_teacher_report(self, summary_df, due_columns):
         """Create teacher report with Paid/Unpaid status"""
-        teacher_df = summary_df[['Student Name', 'Enrollment No', 'Grade', 'Section']].copy()
+        status_columns = [col for col in due_columns if col in summary_df.columns]
         
-        for col in due_columns:
-            if col in summary_df.columns:
-                # -1 means paid, positive means unpaid, 0 means no invoice or not due
-                teacher_df[col] = summary_df[col].apply(
-                    lambda x: 'Unpaid' if x > 0 else ('Paid' if x == -1 else '')
-                )
+        # -1 means paid, positive means unpaid, 0 means no invoice or not due
+        amounts = summary_df[status_columns].to_numpy()
+        status = np.select([amounts > 0, amounts == -1], ['Unpaid', 'Paid'], default='')
         
-        return teacher_df
+        return summary_df[['Student Name', 'Enrollment No', 'Grade', 'Section']].assign(
+            **{col: status[:, i] for i, col in enumerate(status_columns)}
+        )
     
     def create_accounts_report(self, summary_df):
         """Create accounts report with amounts"""
@@ -290,14 +397,13 @@ class FeeDefaulterExtractor:
                       if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
                                      'Grade', 'Section', 'Total Outstanding']]
         
-        for col in fee_columns:
-            if col in accounts_df.columns:
-                accounts_df[col] = accounts_df[col].apply(lambda x: 0 if x == -1 else x)
+        if fee_columns:
+            accounts_df[fee_columns] = accounts_df[fee_columns].mask(accounts_df[fee_columns] == -1, 0)
         
         return accounts_df
     
-    def save_reports(self, summary_df, school):
-        """Save reports to appropriate folders"""
+    def save_reports(self, summary_df, school, zip_file=None):
+        """Save reports to appropriate folders, or into zip_file (same layout) if given"""
         if summary_df.empty:
             return
             
@@ -309,37 +415,65 @@ class FeeDefaulterExtractor:
                       if col not in ['Customer ID', 'Student Name', 'Enrollment No', 
                                      'Grade', 'Section', 'Total Outstanding']]
         
-        # Group by grade and section
-        for (grade, section), group_df in summary_df.groupby(['Grade', 'Section']):
-            # Clean grade and section names for folder/file names
-            grade_clean = str(grade).replace('/', '_').strip()
-            section_clean = str(section).replace('/', '_').strip() if pd.notna(section) else '-'
+        # Build both reports for the whole school at once; each section just slices its rows
+        teacher_all = self.create_teacher_report(summary_df, due_columns)
+        accounts_all = self.create_accounts_report(summary_df)
+        # Paid cells of float fee columns: a section where a column is paid throughout writes it
+        # as integer 0s, as the per-section accounts report always did
+        float_fee_columns = [col for col in due_columns if summary_df[col].dtype.kind == 'f']
+        paid_cells = summary_df[float_fee_columns].to_numpy() == -1
+        school_prefix = 'EGS' if school == 'Excel Global School' else 'ECS'
+        
+        # Clean grade and section names for folder/file names once per distinct value
+        grade_names = {grade: str(grade).replace('/', '_').strip() for grade in summary_df['Grade'].unique()}
+        section_names = {
+            section: str(section).replace('/', '_').strip() if pd.notna(section) else '-'
+            for section in summary_df['Section'].unique()
+        }
+        
+        # Group by grade and section as row positions, without building a DataFrame per group
+        pending_writes = []
+        pending_confirmations = []
+        for (grade, section), positions in summary_df.groupby(['Grade', 'Section']).indices.items():
+            grade_clean = grade_names[grade]
+            section_clean = section_names[section]
             
             # Create descriptive filename
-            school_prefix = 'EGS' if school == 'Excel Global School' else 'ECS'
             filename = f"{school_prefix} {grade_clean} {section_clean}.csv"
             
-            # Create teacher report
-            teacher_report = self.create_teacher_report(group_df, due_columns)
-            teacher_report = teacher_report.sort_values('Student Name')
-            
-            # Create accounts report
-            accounts_report = self.create_accounts_report(group_df)
-            accounts_report = accounts_report.sort_values('Student Name')
+            # Teacher and accounts reports for this section
+            teacher_report = teacher_all.iloc[positions].sort_values('Student Name')
+            accounts_report = accounts_all.iloc[positions].sort_values('Student Name')
+            paid_throughout = paid_cells[positions].all(axis=0)
+            if paid_throughout.any():
+                accounts_report = accounts_report.astype({
+                    col: int for col, paid in zip(float_fee_columns, paid_throughout) if paid
+                })
             
-            # Save teacher report
-            teacher_path = Path(self.output_base_path) / 'teachers' / school / grade_clean
-            teacher_path.mkdir(parents=True, exist_ok=True)
-            teacher_file = teacher_path / filename
-            teacher_report.to_csv(teacher_file, index=False)
-            
-            # Save accounts report
-            accounts_path = Path(self.output_base_path) / 'accounts' / school / grade_clean
-            accounts_path.mkdir(parents=True, exist_ok=True)
-            accounts_file = accounts_path / filename
-            accounts_report.to_csv(accounts_file, index=False)
+            if zip_file is not None:
+                # Write straight into the archive without touching disk
+                zip_file.writestr(f"teachers/{school}/{grade_clean}/{filename}", frame_to_csv(teacher_report))
+                zip_file.writestr(f"accounts/{school}/{grade_clean}/{filename}", frame_to_csv(accounts_report))
+            else:
+                # Queue teacher and accounts reports for the parallel write below
+                pending_writes.append((teacher_report, Path(self.output_base_path) / 'teachers' / school / grade_clean / filename))
+                pending_writes.append((accounts_report, Path(self.output_base_path) / 'accounts' / school / grade_clean / filename))
             
-            print(f"  Saved {grade_clean}/{section_clean}: {len(group_df)} students")
+            confirmation = f"  Saved {grade_clean}/{section_clean}: {len(positions)} students"
+            if zip_file is not None:
+                print(confirmation)
+            else:
+                pending_confirmations.append(confirmation)
+        
+        if pending_writes:
+            # Create each grade folder once, then overlap the file writes on a thread pool
+            for folder in {path.parent for _, path in pending_writes}:
+                folder.mkdir(parents=True, exist_ok=True)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda write: frame_to_csv(*write), pending_writes))
+            # Report sections as saved only once every file has been written (a failed write raises above)
+            for confirmation in pending_confirmations:
+                print(confirmation)
     
     def run(self):
         """Main execution method"""
@@ -1,6 +1,9 @@
 import pandas as pd
 from pathlib import Path
-from fee_extractor import FeeDefaulterExtractor
+from fee_extractor import FeeDefaulterExtractor, CSV_READ_OPTIONS, CONTACT_COLUMNS, present_columns
+
+# Customer_Payment.csv columns used for opening balance payments
+PAYMENT_COLUMNS = ['CustomerID', 'Invoice Number', 'Amount Applied to Invoice', 'Customer Name']
 
 class InitialFeeDefaulterExtractor:
     def __init__(self, contacts_path, invoices_path, payments_path, output_base_path):
@@ -17,26 +20,46 @@ class InitialFeeDefaulterExtractor:
         self.invoices_path = invoices_path
         self.payments_path = payments_path
         self.output_base_path = output_base_path
+        self.contacts_df = None
+        self.invoices_df = None
+        self.payments_df = None
         self.today = pd.Timestamp.now().date()
 
+    @classmethod
+    def from_dataframes(cls, contacts_df, invoices_df, payments_df, output_base_path=None):
+        """Create an extractor over already-parsed contacts, invoices and payments"""
+        extractor = cls(contacts_path=None, invoices_path=None, payments_path=None,
+                        output_base_path=output_base_path)
+        extractor.contacts_df = contacts_df
+        extractor.invoices_df = invoices_df
+        extractor.payments_df = payments_df
+        return extractor
+
     def load_customer_payments(self):
         """Load and process customer payment data"""
         print("Loading customer payment data...")
         try:
-            payments_df = pd.read_csv(self.payments_path)
+            if self.payments_df is not None:
+                payments_df = self.payments_df
+            else:
+                payments_df = pd.read_csv(
+                    self.payments_path, usecols=present_columns(self.payments_path, PAYMENT_COLUMNS), **CSV_READ_OPTIONS
+                )
 
             # Filter for opening balance payments
             opening_balance_payments = payments_df[
                 payments_df['Invoice Number'] == 'Customer opening balance'
-            ].copy()
+            ]
 
-            # Convert amount to numeric
-            opening_balance_payments['Amount Applied to Invoice'] = pd.to_numeric(
-                opening_balance_payments['Amount Applied to Invoice'], errors='coerce'
-            )
+            # Convert amount to numeric (assign returns a new frame, so the filter needs no copy)
+            opening_balance_payments = opening_balance_payments.assign(**{
+                'Amount Applied to Invoice': pd.to_numeric(
+                    opening_balance_payments['Amount Applied to Invoice'], errors='coerce'
+                )
+            })
 
             # Group by CustomerID and sum payments
-            self.opening_balance_payments = opening_balance_payments.groupby('CustomerID').agg({
+            self.opening_balance_payments = opening_balance_payments.groupby('CustomerID', sort=False).agg({
                 'Amount Applied to Invoice': 'sum',
                 'Customer Name': 'first'
             }).reset_index()
@@ -56,22 +79,21 @@ class InitialFeeDefaulterExtractor:
         """Load contacts data and filter for students with opening balances"""
         print("Loading contacts with opening balance data...")
         try:
-            contacts_df = pd.read_csv(self.contacts_path)
-
-            # Convert opening balance to numeric
-            contacts_df['Opening Balance'] = pd.to_numeric(
-                contacts_df['Opening Balance'], errors='coerce'
-            )
-
-            # Filter for students with opening balance > 0
-            contacts_with_balance = contacts_df[
-                contacts_df['Opening Balance'] > 0
-            ].copy()
-
-            # Select relevant columns
-            self.contacts_balance_df = contacts_with_balance[[
-                'Contact ID', 'First Name', 'Last Name', 'School', 'Grade', 'Section', 'Opening Balance'
-            ]].copy()
+            if self.contacts_df is not None:
+                contacts_df = self.contacts_df
+            else:
+                contacts_df = pd.read_csv(
+                    self.contacts_path, usecols=present_columns(self.contacts_path, CONTACT_COLUMNS), **CSV_READ_OPTIONS
+                )
+
+            # Convert opening balance to numeric (left out of contacts_df, which may be shared)
+            opening_balance = pd.to_numeric(contacts_df['Opening Balance'], errors='coerce')
+
+            # Filter for students with opening balance > 0 and select relevant columns
+            has_balance = opening_balance > 0
+            self.contacts_balance_df = contacts_df.loc[has_balance, [
+                'Contact ID', 'First Name', 'Last Name', 'School', 'Grade', 'Section'
+            ]].assign(**{'Opening Balance': opening_balance[has_balance]})
 
             # Create full student name
             self.contacts_balance_df['Student Name'] = self.contacts_balance_df['First Name'] + ' ' + self.contacts_balance_df['Last Name']
@@ -91,33 +113,38 @@ class InitialFeeDefaulterExtractor:
             print("Required data not loaded")
             return pd.DataFrame()
 
-        # Merge contacts with payments
-        merged_df = self.contacts_balance_df.merge(
-            self.opening_balance_payments,
-            left_on='Contact ID',
-            right_on='CustomerID',
-            how='left'
-        )
-
-        # Fill NaN values with 0 for unpaid amounts
-        merged_df['Total Paid Opening Balance'] = merged_df['Total Paid Opening Balance'].fillna(0)
+        # Total paid per contact: payments are already one row per customer, so align them
+        # on Contact ID (unpaid contacts get 0) instead of merging
+        paid = self.opening_balance_payments.set_index('CustomerID')['Total Paid Opening Balance']
+        contact_ids = self.contacts_balance_df['Contact ID']
+        if paid.index.dtype != contact_ids.dtype:
+            # IDs parsed with different dtypes in the two files would silently match nothing, so align
+            # them on numbers when either side is numeric (else on text), re-summing any IDs that collapse
+            if pd.api.types.is_numeric_dtype(paid.index) or pd.api.types.is_numeric_dtype(contact_ids):
+                paid.index = pd.to_numeric(paid.index, errors='coerce')
+                contact_ids = pd.to_numeric(contact_ids, errors='coerce')
+            else:
+                paid.index = paid.index.astype(str)
+                contact_ids = contact_ids.astype(str)
+            paid = paid.groupby(level=0).sum()
+        total_paid = paid.reindex(contact_ids).fillna(0).to_numpy()
 
         # Calculate remaining balance
-        merged_df['Remaining Opening Balance'] = merged_df['Opening Balance'] - merged_df['Total Paid Opening Balance']
+        remaining = self.contacts_balance_df['Opening Balance'].to_numpy() - total_paid
 
         # Filter for students with remaining balance > 0
-        opening_balance_defaulters = merged_df[
-            merged_df['Remaining Opening Balance'] > 0
-        ].copy()
-
-        # Format the defaulters data
-        opening_balance_defaulters = opening_balance_defaulters[[
-            'Contact ID', 'Student Name', 'School', 'Grade', 'Section',
-            'Opening Balance', 'Total Paid Opening Balance', 'Remaining Opening Balance'
-        ]]
-
-        opening_balance_defaulters['Status'] = 'Opening Balance Not Fully Paid'
-        opening_balance_defaulters['Section'] = opening_balance_defaulters['Section'].fillna('-')
+        # and format the defaulters data in one selection
+        has_remaining = remaining > 0
+        opening_balance_defaulters = self.contacts_balance_df.loc[has_remaining, [
+            'Contact ID', 'Student Name', 'School', 'Grade', 'Section', 'Opening Balance'
+        ]].assign(**{
+            'Total Paid Opening Balance': total_paid[has_remaining],
+            'Remaining Opening Balance': remaining[has_remaining]
+        })
+        opening_balance_defaulters = opening_balance_defaulters.assign(
+            Status='Opening Balance Not Fully Paid',
+            Section=opening_balance_defaulters['Section'].fillna('-')
+        )
 
         print(f"Found {len(opening_balance_defaulters)} students with unpaid opening balances")
         return opening_balance_defaulters
@@ -127,7 +154,27 @@ class InitialFeeDefaulterExtractor:
         print("Starting Fee and Opening Balance Defaulter Extraction...")
         print("=" * 70)
 
-        # Load opening balance data first
+        # Use the existing FeeDefaulterExtractor to load and process data
+        if self.contacts_df is not None and self.invoices_df is not None:
+            extractor = FeeDefaulterExtractor.from_dataframes(
+                self.contacts_df, self.invoices_df, output_base_path=self.output_base_path
+            )
+        else:
+            extractor = FeeDefaulterExtractor(
+                contacts_path=self.contacts_path,
+                invoices_path=self.invoices_path,
+                output_base_path=self.output_base_path
+            )
+        # Judge overdue invoices as of this extractor's date
+        extractor.today = self.today
+
+        # Load data using existing functionality, then share the parsed contacts and
+        # invoices so the opening balance step doesn't read Contacts.csv a second time
+        extractor.load_data()
+        self.contacts_df = extractor.contacts_df
+        self.invoices_df = extractor.invoices_df
+
+        # Load opening balance data
         if not self.load_customer_payments():
             print("Failed to load customer payment data")
             return pd.DataFrame()
@@ -139,20 +186,10 @@ class InitialFeeDefaulterExtractor:
         # Get opening balance defaulters
         opening_balance_defaulters = self.identify_opening_balance_defaulters()
 
-        # Use the existing FeeDefaulterExtractor to load and process data
-        extractor = FeeDefaulterExtractor(
-            contacts_path=self.contacts_path,
-            invoices_path=self.invoices_path,
-            output_base_path=self.output_base_path
-        )
-
-        # Load data using existing functionality
-        extractor.load_data()
-
         # Process invoices using existing functionality
         defaulter_invoices = extractor.process_invoices()
 
-        # Collect all initial fee defaulters
+        # Collect all initial fee defaulters (one frame per school)
         all_defaulters = []
 
         # Process each school
@@ -164,100 +201,70 @@ class InitialFeeDefaulterExtractor:
             # Filter for specific school
             school_invoices = defaulter_invoices[
                 defaulter_invoices['School'] == school
-            ].copy()
+            ]
 
             if len(school_invoices) == 0:
                 print(f"No defaulters found for {school}")
                 continue
 
-            # Extract fee type using existing method
-            school_invoices['Fee Type'] = school_invoices['Item Name'].apply(
-                lambda x: extractor.extract_fee_type(x, school)
-            )
-
             # Filter for initial fee defaulters only
             initial_fee_defaulters = school_invoices[
                 school_invoices['Fee Type'] == 'Initial Fee'
-            ].copy()
+            ]
 
             if len(initial_fee_defaulters) == 0:
                 print(f"No initial fee defaulters found for {school}")
                 continue
 
-            # Get unique defaulter customer IDs
-            defaulter_ids = initial_fee_defaulters['Customer ID'].unique()
+            # Get unique defaulter customer codes (integer stand-ins for the IDs)
+            defaulter_codes = initial_fee_defaulters['Customer Code'].unique()
 
-            # Get ALL invoices for these defaulters to check complete payment status
+            # Customers with ANY closed/paid initial fee invoice have actually paid it
             all_invoices_for_defaulters = extractor.invoices_df[
-                (extractor.invoices_df['Customer ID'].isin(defaulter_ids)) &
+                (extractor.invoices_df['Customer Code'].isin(defaulter_codes)) &
                 (extractor.invoices_df['School'] == school)
-            ].copy()
-
-            all_invoices_for_defaulters['Fee Type'] = all_invoices_for_defaulters['Item Name'].apply(
-                lambda x: extractor.extract_fee_type(x, school)
-            )
-
-            # Group by student and grade/section
-            initial_fee_defaulters['Section'] = initial_fee_defaulters['Section'].fillna('-')
-
-            for (customer_id, grade, section), group in initial_fee_defaulters.groupby(
-                ['Customer ID', 'Grade', 'Section']
-            ):
-                # Check if initial fee is actually unpaid
-                student_all_invoices = all_invoices_for_defaulters[
-                    all_invoices_for_defaulters['Customer ID'] == customer_id
-                ]
-
-                # Check initial fee status
-                initial_fee_invoices = student_all_invoices[
-                    student_all_invoices['Fee Type'] == 'Initial Fee'
-                ]
-
-                if len(initial_fee_invoices) > 0:
-                    # Check if fee is paid
-                    has_closed = any(initial_fee_invoices['Invoice Status'].isin(['Closed', 'Paid']))
-
-                    if not has_closed:
-                        # Student has initial fee that is not paid
-                        defaulter_data = {
-                            'Customer ID': customer_id,
-                            'Student Name': group['Student Name'].iloc[0],
-                            'School': school,
-                            'Grade': grade,
-                            'Section': section if pd.notna(section) else '-',
-                            'Status': 'Initial Fee Not Paid',
-                            'Opening Balance': 0.00,
-                            'Total Paid Opening Balance': 0.00,
-                            'Remaining Opening Balance': 0.00
-                        }
-                        all_defaulters.append(defaulter_data)
+            ]
+            paid_ids = all_invoices_for_defaulters.loc[
+                (all_invoices_for_defaulters['Fee Type'] == 'Initial Fee') &
+                all_invoices_for_defaulters['Invoice Status'].isin(['Closed', 'Paid']),
+                'Customer ID'
+            ].unique()
+
+            # One row per student and grade/section whose initial fee is unpaid
+            students = initial_fee_defaulters.groupby([
+                initial_fee_defaulters['Customer ID'],
+                initial_fee_defaulters['Grade'],
+                initial_fee_defaulters['Section'].fillna('-')
+            ])['Student Name'].first().reset_index()
+            unpaid_students = students[~students['Customer ID'].isin(paid_ids)]
+
+            if not unpaid_students.empty:
+                all_defaulters.append(unpaid_students.assign(**{
+                    'School': school,
+                    'Status': 'Initial Fee Not Paid',
+                    'Opening Balance': 0.00,
+                    'Total Paid Opening Balance': 0.00,
+                    'Remaining Opening Balance': 0.00
+                })[[
+                    'Customer ID', 'Student Name', 'School', 'Grade', 'Section', 'Status',
+                    'Opening Balance', 'Total Paid Opening Balance', 'Remaining Opening Balance'
+                ]])
 
             print(f"Found {len(initial_fee_defaulters['Customer ID'].unique())} initial fee defaulters in {school}")
 
         # Merge with opening balance defaulters
+        defaulter_frames = list(all_defaulters)
         if not opening_balance_defaulters.empty:
             # Format opening balance defaulters to match the structure
-            formatted_opening_balance_defaulters = []
-            for _, row in opening_balance_defaulters.iterrows():
-                formatted_data = {
-                    'Customer ID': row['Contact ID'],
-                    'Student Name': row['Student Name'],
-                    'School': row['School'],
-                    'Grade': row['Grade'],
-                    'Section': row['Section'],
-                    'Status': row['Status'],
-                    'Opening Balance': row['Opening Balance'],
-                    'Total Paid Opening Balance': row['Total Paid Opening Balance'],
-                    'Remaining Opening Balance': row['Remaining Opening Balance']
-                }
-                formatted_opening_balance_defaulters.append(formatted_data)
-
-            all_defaulters.extend(formatted_opening_balance_defaulters)
-            print(f"\nAdded {len(formatted_opening_balance_defaulters)} opening balance defaulters")
+            defaulter_frames.append(opening_balance_defaulters.rename(columns={'Contact ID': 'Customer ID'})[[
+                'Customer ID', 'Student Name', 'School', 'Grade', 'Section', 'Status',
+                'Opening Balance', 'Total Paid Opening Balance', 'Remaining Opening Balance'
+            ]])
+            print(f"\nAdded {len(opening_balance_defaulters)} opening balance defaulters")
 
         # Create DataFrame from all defaulters
-        if all_defaulters:
-            defaulters_df = pd.DataFrame(all_defaulters)
+        if defaulter_frames:
+            defaulters_df = pd.concat(defaulter_frames, ignore_index=True)
 
             # Remove duplicates (students who have both unpaid fees and opening balance)
             defaulters_df = defaulters_df.drop_duplicates(subset=['Customer ID'], keep='first')
@@ -271,27 +278,28 @@ class InitialFeeDefaulterExtractor:
             print("\nNo defaulters found")
             return pd.DataFrame()
 
-    def save_defaulters_report(self, defaulters_df):
-        """Save the fee and opening balance defaulters report"""
+    def save_defaulters_report(self, defaulters_df, zip_file=None):
+        """Save the fee and opening balance defaulters report, or into zip_file if given"""
         if defaulters_df.empty:
             print("No data to save")
             return
 
-        # Create output directory if it doesn't exist
-        output_path = Path(self.output_base_path)
-        output_path.mkdir(parents=True, exist_ok=True)
-
-        # Save to CSV with better formatting
-        output_file = output_path / 'fee_and_opening_balance_defaulters.csv'
-
         # Format numeric columns
-        defaulters_df_copy = defaulters_df.copy()
         numeric_cols = ['Opening Balance', 'Total Paid Opening Balance', 'Remaining Opening Balance']
-        for col in numeric_cols:
-            if col in defaulters_df_copy.columns:
-                defaulters_df_copy[col] = defaulters_df_copy[col].round(2)
+        defaulters_df_copy = defaulters_df.round({col: 2 for col in numeric_cols})
+
+        if zip_file is not None:
+            # Write the report straight into the archive, no file on disk
+            output_file = 'fee_and_opening_balance_defaulters.csv'
+            zip_file.writestr(output_file, defaulters_df_copy.to_csv(index=False))
+        else:
+            # Create output directory if it doesn't exist
+            output_path = Path(self.output_base_path)
+            output_path.mkdir(parents=True, exist_ok=True)
 
-        defaulters_df_copy.to_csv(output_file, index=False)
+            # Save to CSV with better formatting
+            output_file = output_path / 'fee_and_opening_balance_defaulters.csv'
+            defaulters_df_copy.to_csv(output_file, index=False)
 
         print(f"Report saved to: {output_file}")
         print(f"Total records: {len(defaulters_df_copy)}")